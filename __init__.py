@@ -1,2 +1,2 @@
 from sets import Set, OrderedSet
-from solver import Model, Solver, Solution
\ No newline at end of file
+from solver import Model, Solver, Solution, Template, Stats, SolveTimeout
\ No newline at end of file
@@ -0,0 +1,58 @@
+import sys
+import json
+import argparse
+import tracemalloc
+from time import perf_counter
+from generator import generate
+
+# Times `Model.solver()` and `Solver.solve()` on generated puzzles across a grid of (k sets, n items)
+# and writes one record per puzzle to a JSON file.
+
+def measure(model, engine: str, search: bool) -> dict:
+    start = perf_counter()
+    solver = model.solver(engine)
+    built = perf_counter()
+    try:
+        solver.solve(search=search)
+        solved = True
+    except (ValueError, ArithmeticError):
+        solved = False
+    done = perf_counter()
+    # memory is measured in a second run, tracing allocations distorts the timings
+    tracemalloc.start()
+    try:
+        model.solver(engine).solve(search=search)
+    except (ValueError, ArithmeticError):
+        pass
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {'build_time': built - start, 'solve_time': done - built, 'peak_memory': peak, 'solved': solved}
+
+def run(ks: list[int], ns: list[int], seeds: int, engines: list[str], search: bool, log=sys.stderr) -> list[dict]:
+    records = []
+    for k in ks:
+        for n in ns:
+            for seed in range(seeds):
+                model, _ = generate(k, n, seed=seed)
+                for engine in engines:
+                    record = {'k': k, 'n': n, 'seed': seed, 'engine': engine, 'relations': len(model.relations)}
+                    record.update(measure(model, engine, search))
+                    records.append(record)
+                    print(f'k={k} n={n} seed={seed} {engine}: build {record["build_time"] * 1000:.2f}ms, solve {record["solve_time"] * 1000:.2f}ms, peak {record["peak_memory"] / 1024:.0f}KiB', file=log)
+    return records
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark the solver on generated puzzles')
+    parser.add_argument('--k', type=int, nargs='+', default=[3, 4, 5], help='numbers of sets')
+    parser.add_argument('--n', type=int, nargs='+', default=[5, 10, 20], help='numbers of items per set')
+    parser.add_argument('--seeds', type=int, default=3, help='puzzles per (k, n)')
+    parser.add_argument('--engine', nargs='+', default=['python'], help='solver engines to compare')
+    parser.add_argument('--search', action='store_true', help='solve with search enabled')
+    parser.add_argument('--out', default='bench_output.json', help='file the records are written to')
+    args = parser.parse_args(argv)
+    records = run(args.k, args.n, args.seeds, args.engine, args.search)
+    with open(args.out, 'w') as f:
+        json.dump(records, f, indent=1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,38 @@
+def bit(i: int) -> int:
+    return 1 << i
+
+def full(n: int) -> int:
+    return (1 << n) - 1
+
+def below(i: int) -> int:
+    # mask of all indices strictly smaller than i
+    return (1 << i) - 1
+
+def lowest(mask: int) -> int:
+    return (mask & -mask).bit_length() - 1
+
+def highest(mask: int) -> int:
+    return mask.bit_length() - 1
+
+def indices(mask: int):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+def column(rows: list[int], j: int) -> int:
+    # mask of the rows containing index j
+    mask = 0
+    for i, m in enumerate(rows):
+        if m >> j & 1:
+            mask |= 1 << i
+    return mask
+
+def transpose(rows: list[int], n: int, mask: int = -1) -> list[int]:
+    # the n columns of the rows, with `mask` only the columns it contains are filled in
+    columns = [0] * n
+    for i, m in enumerate(rows):
+        b = 1 << i
+        for j in indices(m & mask):
+            columns[j] |= b
+    return columns
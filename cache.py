@@ -0,0 +1,163 @@
+import json
+import sqlite3
+import hashlib
+from math import factorial
+from itertools import permutations, product
+from collections import OrderedDict
+from sets import Set, OrderedSet
+from solver import Model, Solution
+
+# Content-addressed solution cache.
+# A model is serialized canonically: items are replaced by their positions, sets are put into a canonical order
+# and relations are normalized, deduplicated and sorted. Puzzles which only differ in item names (or the values
+# of ordered sets), set order or relation order therefore share one key. Solutions are stored as rows of positions
+# and mapped back to the items of the asking model.
+
+# beyond this many equally looking set orders the first one is taken, the key then only misses some duplicates
+MAX_ORDERS = 720
+
+def normalize(model: Model) -> list[tuple]:
+    # (type, (set, position), (set, position), foreign set or None) for every relation, see `Relation.normalized`
+    normalized = []
+    for r in model.relations:
+        ty, a, b, f = r.normalized()
+        normalized.append((ty, (a.set, a.index), (b.set, b.index), f))
+    return normalized
+
+def relations(normalized: list[tuple], order: list[Set]) -> list[tuple]:
+    # the normalized relations with sets replaced by their position in `order`, deduplicated and sorted
+    position = {s.name: i for i, s in enumerate(order)}
+    result = set()
+    for ty, (a, i), (b, j), f in normalized:
+        x, y = (position[a.name], i), (position[b.name], j)
+        if ty in ('eq', 'ne'):
+            x, y = sorted((x, y))
+        result.add((ty, x, y) if f is None else (ty, x, y, position[f.name]))
+    return sorted(result)
+
+def signature(normalized: list[tuple], s: Set) -> tuple:
+    # describes the role of a set in the model without referring to names or other sets
+    uses = []
+    for ty, (a, _), (b, _), f in normalized:
+        # both sides of (in)equalities are interchangeable
+        sides = (0, 0) if ty in ('eq', 'ne') else (0, 1)
+        uses += [(ty, side) for side, x in zip(sides, (a, b)) if x is s]
+        if f is s:
+            uses.append((ty, 2))
+    return isinstance(s, OrderedSet), len(s.items), tuple(sorted(uses))
+
+def canonical(model: Model) -> tuple[list[Set], str]:
+    # returns the sets in canonical order and the canonical serialization of the model
+    normalized = normalize(model)
+    groups = {}
+    for s in model.sets:
+        groups.setdefault(signature(normalized, s), []).append(s)
+    groups = [groups[k] for k in sorted(groups)]
+    orders = 1
+    for g in groups:
+        orders *= factorial(len(g))
+    if orders > MAX_ORDERS:
+        candidates = [[s for g in groups for s in g]]
+    else:
+        candidates = ([s for g in order for s in g] for order in product(*(permutations(g) for g in groups)))
+    best = None
+    for order in candidates:
+        text = json.dumps({'sets': [[isinstance(s, OrderedSet), len(s.items)] for s in order], 'relations': relations(normalized, order)}, separators=(',', ':'))
+        if best is None or text < best[1]:
+            best = (list(order), text)
+    return best
+
+def digest(model: Model) -> str:
+    # stable hash of the canonical serialization
+    return hashlib.sha256(canonical(model)[1].encode()).hexdigest()
+
+class Cache:
+    # in-memory LRU of solutions keyed by canonical model hash, evicting the least recently used entries
+    # once the cached values exceed `max_bytes`. An optional `store` (e.g. `SqliteStore`) keeps them across processes.
+    def __init__(self, max_bytes: int = 1 << 24, store: 'SqliteStore|None' = None):
+        self.max_bytes = max_bytes
+        self.store = store
+        self.entries: OrderedDict[str, str] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> 'str|None':
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            return self.entries[key]
+        value = self.store.get(key) if self.store is not None else None
+        if value is not None:
+            self.remember(key, value)
+        return value
+
+    def put(self, key: str, value: str):
+        self.remember(key, value)
+        if self.store is not None:
+            self.store.put(key, value)
+
+    def remember(self, key: str, value: str):
+        if key in self.entries:
+            self.size -= len(self.entries.pop(key))
+        self.entries[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, evicted = self.entries.popitem(last=False)
+            self.size -= len(evicted)
+
+    def solve(self, model: Model, engine: str = 'python', search: bool = False) -> Solution:
+        # like `model.solver(engine).solve(search=search)`, but identical puzzles are only solved once.
+        # Unsolvable puzzles are cached as well, under-constrained ones (ValueError) are not.
+        # a search (which the sat engine always does) may return any solution, propagation only a forced one,
+        # and how far propagation gets depends on the engine
+        order, text = canonical(model)
+        kind = '/search' if search or engine == 'sat' else '' if engine == 'python' else '/' + engine
+        key = hashlib.sha256(text.encode()).hexdigest() + kind
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            rows = json.loads(value)
+            if rows is None:
+                raise ArithmeticError('The model is not solvable (cached)')
+            return restore(model, order, rows)
+        self.misses += 1
+        try:
+            solution = model.solver(engine).solve(search=search)
+        except ArithmeticError:
+            self.put(key, 'null')
+            raise
+        self.put(key, json.dumps(positions(order, solution)))
+        return solution
+
+def positions(order: list[Set], solution: Solution) -> list[list[int]]:
+    # the rows of a solution as item positions of the sets in canonical order, sorted
+    column = {name: i for i, name in enumerate(solution.headings)}
+    rows = [[s.index[row[column[s.name]]] for s in order] for row in solution.rows]
+    return sorted(rows)
+
+def restore(model: Model, order: list[Set], rows: list[list[int]]) -> Solution:
+    # maps cached positions back to the items of `model`, in the layout `Solver.solution` uses
+    position = {s.name: i for i, s in enumerate(order)}
+    first = position[model.sets[0].name]
+    solution = Solution.__new__(Solution)
+    solution.headings = [s.name for s in model.sets]
+    solution.rows = [tuple(s.items[row[position[s.name]]] for s in model.sets) for row in sorted(rows, key=lambda row: row[first])]
+    return solution
+
+class SqliteStore:
+    # persistent key value store for `Cache`, safe to share between processes
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('CREATE TABLE IF NOT EXISTS solutions (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+        self.connection.commit()
+
+    def get(self, key: str) -> 'str|None':
+        row = self.connection.execute('SELECT value FROM solutions WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def put(self, key: str, value: str):
+        self.connection.execute('INSERT OR REPLACE INTO solutions (key, value) VALUES (?, ?)', (key, value))
+        self.connection.commit()
+
+    def close(self):
+        self.connection.close()
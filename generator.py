@@ -0,0 +1,77 @@
+import random
+from sets import Set, OrderedSet, Relation
+from solver import Model
+
+# Seeded puzzle generator: plants a random solution across k sets of n items
+# and emits relations which hold for it until propagation alone solves the model.
+
+def plant(k: int, n: int, ordered: int = 1, seed: int = 0) -> tuple[list[Set], list[list]]:
+    # returns the sets and the planted solution as rows, row r holds the r-th item of every set
+    rnd = random.Random(seed)
+    sets = [Set(f's{j}', [f's{j}_{i}' for i in range(n)]) for j in range(k - ordered)]
+    sets += [OrderedSet(f'o{j}', [10 * i for i in range(n)]) for j in range(ordered)]
+    columns = []
+    for s in sets:
+        column = list(s.items)
+        rnd.shuffle(column)
+        columns.append(column)
+    rows = [[column[r] for column in columns] for r in range(len(columns[0]))]
+    return sets, rows
+
+def relation(sets: list[Set], rows: list[list], rnd: random.Random) -> 'Relation|list[Relation]':
+    # a random relation which holds for the planted rows
+    n = len(rows)
+    ordered = [j for j, s in enumerate(sets) if isinstance(s, OrderedSet)]
+    r1, r2 = rnd.sample(range(n), 2)
+    a, b = rnd.sample(range(len(sets)), 2)
+    kind = rnd.random()
+    if kind < 0.1:
+        return sets[a][rows[r1][a]] == sets[b][rows[r1][b]]
+    if kind < 0.5 or not ordered:
+        return sets[a][rows[r1][a]] != sets[b][rows[r2][b]]
+    o = rnd.choice(ordered)
+    unordered = [j for j in range(len(sets)) if j != o]
+    if kind < 0.7 and len(unordered) > 1:
+        # foreign comparison, the lower row first
+        lo, hi = sorted((r1, r2), key=lambda r: rows[r][o])
+        a, b = rnd.sample(unordered, 2)
+        return sets[a][rows[lo][a]](sets[o]) < sets[b][rows[hi][b]](sets[o])
+    if kind < 0.85:
+        a = rnd.choice(unordered)
+        if rows[r1][o] > rows[r2][o]:
+            return sets[a][rows[r1][a]] > sets[o][rows[r2][o]]
+        return sets[a][rows[r1][a]] < sets[o][rows[r2][o]]
+    # two items which both are not related to a third one
+    if len(sets) < 3:
+        return sets[a][rows[r1][a]] != sets[b][rows[r2][b]]
+    a, b, c = rnd.sample(range(len(sets)), 3)
+    r3 = rnd.choice([r for r in range(n) if r != r2])
+    return (sets[a][rows[r1][a]] & sets[b][rows[r3][b]]) != sets[c][rows[r2][c]]
+
+def solved(sets: list[Set], relations: list) -> bool:
+    model = Model(*sets)
+    for r in relations:
+        model.relate(r)
+    try:
+        model.solver().solve()
+        return True
+    except (ValueError, ArithmeticError):
+        return False
+
+def generate(k: int, n: int, ordered: int = 1, seed: int = 0, minimize: bool = True) -> tuple[Model, list[list]]:
+    # returns the model and the planted rows
+    rnd = random.Random(seed)
+    sets, rows = plant(k, n, ordered, seed)
+    relations = []
+    while not solved(sets, relations):
+        relations += [relation(sets, rows, rnd) for _ in range(max(1, n // 2))]
+    if minimize:
+        # drop every relation which is not needed to solve the model by propagation
+        for r in rnd.sample(relations, len(relations)):
+            rest = [x for x in relations if x is not r]
+            if solved(sets, rest):
+                relations = rest
+    model = Model(*sets)
+    for r in relations:
+        model.relate(r)
+    return model, rows
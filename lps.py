@@ -1 +1,87 @@
-from __init__ import *
\ No newline at end of file
+from __init__ import *
+import os
+import sys
+import json
+import operator
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# Batch mode: reads one puzzle spec per line (JSONL) and writes one solution per line in input order.
+#
+# {"id": 1,
+#  "sets": [{"name": "names", "items": ["anne", "anja", "anke"]}, {"name": "grades", "items": [1.7, 2.6, 3.8], "ordered": true}, ...],
+#  "relations": [[["names", "anne", "grades"], "==", 2.6],                  names['anne'](grades) == 2.6
+#                [["names", "anja"], "==", ["subjects", "algorythms"]],     names['anja'] == subjects['algorythms']
+#                [{"and": [["names", "anke"], ["last_names", "kramer"]]}, ">", ["grades", 1.7]]]}
+
+OPERATORS = {'==': operator.eq, '!=': operator.ne, '<': operator.lt, '<=': operator.le, '>': operator.gt, '>=': operator.ge}
+
+def operand(spec, sets: dict[str, Set]):
+    if isinstance(spec, dict):
+        items = [operand(s, sets) for s in spec['and']]
+        result = items[0]
+        for item in items[1:]:
+            result = result & item
+        return result
+    if isinstance(spec, list):
+        item = sets[spec[0]][spec[1]]
+        if len(spec) == 3:
+            return item(sets[spec[2]])
+        return item
+    # plain value of the foreign set on the other side
+    return spec
+
+def build(spec: dict) -> Model:
+    sets = {}
+    for s in spec['sets']:
+        sets[s['name']] = (OrderedSet if s.get('ordered') else Set)(s['name'], s['items'])
+    model = Model(*sets.values())
+    for a, op, b in spec.get('relations', []):
+        model.relate(OPERATORS[op](operand(a, sets), operand(b, sets)))
+    return model
+
+def solve_line(line: str, search: bool = False) -> str:
+    result = {}
+    try:
+        spec = json.loads(line)
+        if 'id' in spec:
+            result['id'] = spec['id']
+        solution = build(spec).solver().solve(search=search)
+        result['solution'] = [dict(zip(solution.headings, row)) for row in solution.rows]
+    except Exception as e:
+        result['error'] = f'{e.__class__.__name__}: {e}'
+    return json.dumps(result)
+
+def run(lines, out, workers: int = 1, search: bool = False, in_flight: int = None):
+    lines = (line for line in lines if line.strip())
+    if workers <= 1:
+        for line in lines:
+            out.write(solve_line(line, search) + '\n')
+        return
+    # at most `in_flight` puzzles are submitted but not yet written, results are written in input order
+    in_flight = in_flight or workers * 4
+    with ProcessPoolExecutor(workers) as executor:
+        pending = deque()
+        for line in lines:
+            pending.append(executor.submit(solve_line, line, search))
+            if len(pending) >= in_flight:
+                out.write(pending.popleft().result() + '\n')
+        while pending:
+            out.write(pending.popleft().result() + '\n')
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Solve a JSONL stream of logic puzzles, one solution per line')
+    parser.add_argument('input', nargs='?', default='-', help='JSONL file with one puzzle per line, `-` for stdin')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='number of worker processes')
+    parser.add_argument('--in-flight', type=int, default=None, help='maximum number of puzzles in flight, defaults to 4 per worker')
+    parser.add_argument('--search', action='store_true', help='branch on open candidates instead of reporting unsolved puzzles')
+    args = parser.parse_args(argv)
+    if args.input == '-':
+        run(sys.stdin, sys.stdout, args.workers, args.search, args.in_flight)
+    else:
+        with open(args.input) as f:
+            run(f, sys.stdout, args.workers, args.search, args.in_flight)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+# All-different propagation for one pair of sets (Régin):
+# the rows (items of one set) have to be matched perfectly to the columns (items of the other set),
+# a candidate is only kept if it is part of some perfect matching.
+# `match[i]` is the column matched to row i (or -1), it is kept between calls and repaired incrementally.
+
+def augment(rows: list[int], match: list[int], owner: list[int], root: int) -> bool:
+    # depth first search for an augmenting path starting at the free row `root`
+    visited = 0
+    stack = [(root, rows[root])]
+    path = []
+    while stack:
+        i, candidates = stack[-1]
+        candidates &= ~visited
+        if not candidates:
+            stack.pop()
+            if path:
+                path.pop()
+            continue
+        low = candidates & -candidates
+        j = low.bit_length() - 1
+        visited |= low
+        stack[-1] = (i, candidates ^ low)
+        path.append(j)
+        if owner[j] < 0:
+            for (r, _), c in zip(stack, path):
+                match[r] = c
+                owner[c] = r
+            return True
+        stack.append((owner[j], rows[owner[j]]))
+    return False
+
+def components(rows: list[int], match: list[int], owner: list[int]) -> list[int]:
+    # strongly connected components (Tarjan) of the rows, row i points to the owner of every unmatched candidate
+    n = len(rows)
+    index = [-1] * n
+    low = [0] * n
+    component = [-1] * n
+    on_stack = [False] * n
+    stack = []
+    counter = 0
+    count = 0
+    for s in range(n):
+        if index[s] >= 0:
+            continue
+        index[s] = low[s] = counter
+        counter += 1
+        stack.append(s)
+        on_stack[s] = True
+        work = [(s, rows[s] & ~(1 << match[s]))]
+        while work:
+            v, candidates = work[-1]
+            if candidates:
+                lowest = candidates & -candidates
+                work[-1] = (v, candidates ^ lowest)
+                w = owner[lowest.bit_length() - 1]
+                if index[w] < 0:
+                    index[w] = low[w] = counter
+                    counter += 1
+                    stack.append(w)
+                    on_stack[w] = True
+                    work.append((w, rows[w] & ~(1 << match[w])))
+                elif on_stack[w]:
+                    low[v] = min(low[v], index[w])
+                continue
+            work.pop()
+            if work:
+                u = work[-1][0]
+                low[u] = min(low[u], low[v])
+            if low[v] == index[v]:
+                while True:
+                    w = stack.pop()
+                    on_stack[w] = False
+                    component[w] = count
+                    if w == v:
+                        break
+                count += 1
+    return component
+
+def supported(rows: list[int], match: list[int]) -> list[int]:
+    # the candidates of every row which are part of a perfect matching,
+    # without a perfect matching the first unmatched row has none
+    n = len(rows)
+    owner = [-1] * n
+    for i, j in enumerate(match):
+        if j >= 0 and rows[i] >> j & 1 and owner[j] < 0:
+            owner[j] = i
+        else:
+            match[i] = -1
+    for i in range(n):
+        if match[i] < 0 and not augment(rows, match, owner, i):
+            allowed = list(rows)
+            allowed[i] = 0
+            return allowed
+    # an unmatched candidate j of row i is part of a perfect matching
+    # if and only if i and the owner of j are in the same strongly connected component
+    component = components(rows, match, owner)
+    columns = [0] * n
+    for i in range(n):
+        columns[component[i]] |= 1 << match[i]
+    return [rows[i] & columns[component[i]] for i in range(n)]
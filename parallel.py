@@ -0,0 +1,83 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from multiprocessing import Event
+from bits import bit, indices
+from time import perf_counter
+from solver import Model, Solver, Solution, SolveTimeout
+
+# solver of the current worker process, built once per process by `start`
+worker: Solver = None
+
+def start(sets, relations, stop):
+    global worker
+    model = Model(*sets)
+    model.relate(relations)
+    worker = model.solver()
+    worker.stop = stop.is_set
+
+def explore(snapshot: tuple[int, ...]) -> 'tuple[int, ...]|None':
+    # back to the initial domains first, the trail of the worker does not grow with every subproblem
+    worker.undo(0)
+    worker.restore(snapshot)
+    for _ in worker.branches():
+        return worker.snapshot()
+    return None
+
+def split(solver: Solver, count: int) -> list[tuple[int, ...]]:
+    # breadth first expansion of the top of the search tree into independent, propagated subproblems
+    solver.propagate()
+    if solver.conflict is not None:
+        return []
+    frontier = deque([solver.snapshot()])
+    while len(frontier) < count:
+        snapshot = frontier.popleft()
+        solver.restore(snapshot)
+        solver.propagate()
+        choice = solver.choose()
+        if choice is None:
+            # already solved, no need to split any further
+            frontier.appendleft(snapshot)
+            break
+        f, key = choice
+        for i in indices(f.get(key)):
+            mark = len(solver.trail)
+            f.keep(key, bit(i))
+            solver.propagate()
+            if solver.conflict is None:
+                frontier.append(solver.snapshot())
+            solver.undo(mark)
+        if not frontier:
+            break
+    return list(frontier)
+
+def solve_parallel(solver: Solver, workers: int) -> Solution:
+    # like a sequential search, the solver is left in its propagated state without any decision applied
+    solver.propagate()
+    mark = len(solver.trail)
+    subproblems = split(solver, workers * 4)
+    solver.undo(mark)
+    result = None
+    if subproblems:
+        sets = [ss.set for ss in solver.super_sets.values()]
+        stop = Event()
+        with ProcessPoolExecutor(workers, initializer=start, initargs=(sets, solver.relations, stop)) as executor:
+            pending = {executor.submit(explore, s) for s in subproblems}
+            while pending and result is None and not solver.expired():
+                timeout = None if solver.deadline is None else max(0, solver.deadline - perf_counter())
+                done, pending = wait(pending, timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.result() is not None:
+                        result = future.result()
+                        break
+            # the first solution wins, the remaining subproblems are cancelled
+            stop.set()
+            for future in pending:
+                future.cancel()
+    if result is None and solver.expired():
+        raise SolveTimeout(solver)
+    if result is None:
+        raise ArithmeticError('The model is not solvable since every branch leads to a contradiction')
+    solver.restore(result)
+    solution = solver.solution()
+    solver.undo(mark)
+    return solution
@@ -0,0 +1,213 @@
+import os
+import re
+import sys
+import json
+import mmap
+import struct
+import threading
+from array import array
+from sets import Set, OrderedSet, Relation, ForeignSet
+from solver import Model, Solver
+
+# Text puzzle format, one declaration or relation per line, `#` starts a comment:
+#
+#   set names: anne anja anke
+#   ordered grades: 1.7 2.6 3.8
+#   names[anne](grades) == 2.6                  names['anne'](grades) == 2.6
+#   names[anja](grades) < last_names[wolff](grades)
+#   names[anke] & last_names[kramer] > grades[1.7]
+#
+# Items are separated by whitespace, items of ordered sets are read as numbers where possible.
+# `parse` compiles it in one pass straight into integer records, no `Item` or `Relation` is created.
+# Compiled puzzles are stored as a small JSON header (the sets) followed by the records as int32,
+# `load` memory-maps such a file and reads the records without copying them.
+
+TYPES = ['eq', 'ne', 'lt', 'le', 'gt', 'ge']
+OPERATORS = {'==': 'eq', '!=': 'ne', '<': 'lt', '<=': 'le', '>': 'gt', '>=': 'ge'}
+# a record is (type, set a, item a, set b, item b, foreign set or -1 for relations between items)
+RECORD = 6
+MAGIC = b'LPS1'
+
+DECLARATION = re.compile(r'(set|ordered)\s+([^\s:]+)\s*:(.*)')
+RELATION = re.compile(r'(.+?)\s*(==|!=|<=|>=|<|>)\s*(.+)')
+TERM = re.compile(r'([^\s\[\]()&]+)\[([^\]]+)\](?:\(([^\s()]+)\))?')
+
+def number(token: str):
+    for ty in (int, float):
+        try:
+            return ty(token)
+        except ValueError:
+            pass
+    return token
+
+class Compiled:
+    def __init__(self, sets: list[tuple[str, bool, list]], records):
+        # sets as (name, ordered, items), `records` is a flat int sequence of RECORD sized relations
+        self.sets = sets
+        self.records = records
+
+    def model(self) -> Model:
+        sets = [(OrderedSet if ordered else Set)(name, items) for name, ordered, items in self.sets]
+        model = Model(*sets)
+        r = self.records
+        for k in range(0, len(r), RECORD):
+            a, b = sets[r[k + 1]].interned[r[k + 2]], sets[r[k + 3]].interned[r[k + 4]]
+            if r[k + 5] < 0:
+                model.relate(Relation(a, b, TYPES[r[k]]))
+            else:
+                f = sets[r[k + 5]]
+                model.relate(Relation(ForeignSet(a, f), ForeignSet(b, f), TYPES[r[k]]))
+        return model
+
+    def solver(self, engine: str = 'python') -> Solver:
+        return self.model().solver(engine)
+
+    def dumps(self) -> bytes:
+        header = json.dumps(self.sets, separators=(',', ':')).encode()
+        records = array('i', self.records)
+        if sys.byteorder == 'big':
+            records.byteswap()
+        # the records start 4 byte aligned so they can be cast in place
+        padding = -(len(MAGIC) + 4 + len(header)) % 4
+        return MAGIC + struct.pack('<I', len(header) + padding) + header + b' ' * padding + records.tobytes()
+
+    @staticmethod
+    def loads(buffer) -> 'Compiled':
+        # `buffer` may be bytes or a memory map, the records are read straight from it
+        view = memoryview(buffer)
+        if bytes(view[:len(MAGIC)]) != MAGIC:
+            raise Exception('Not a compiled puzzle')
+        size, = struct.unpack_from('<I', view, len(MAGIC))
+        start = len(MAGIC) + 4
+        sets = [(name, ordered, items) for name, ordered, items in json.loads(bytes(view[start:start + size]))]
+        records = view[start + size:].cast('i')
+        if sys.byteorder == 'big':
+            records = array('i', records)
+            records.byteswap()
+        return Compiled(sets, records)
+
+def parse(text: str) -> Compiled:
+    sets = []
+    # name -> (position, item token -> index)
+    names = {}
+    records = array('i')
+    for n, line in enumerate(text.splitlines(), 1):
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        match = DECLARATION.fullmatch(line)
+        if match:
+            kind, name, tokens = match.group(1), match.group(2), match.group(3).split()
+            if name in names:
+                raise Exception(f'line {n}: set `{name}` is declared twice')
+            if sets and len(tokens) != len(sets[0][2]):
+                raise Exception(f'line {n}: all sets of a model must be of equal size')
+            if kind == 'ordered':
+                values = [(number(t), t) for t in tokens]
+                if len({isinstance(v, str) for v, _ in values}) > 1:
+                    raise Exception(f'line {n}: the items of ordered `{name}` mix numbers and names')
+                values.sort()
+                items = [v for v, _ in values]
+                index = {t: i for i, (_, t) in enumerate(values)}
+            else:
+                items = tokens
+                index = {t: i for i, t in enumerate(tokens)}
+            if len(index) != len(tokens):
+                raise Exception(f'line {n}: the items of `{name}` are not unique')
+            names[name] = (len(sets), index)
+            sets.append((name, kind == 'ordered', items))
+            continue
+        match = RELATION.fullmatch(line)
+        if not match:
+            raise Exception(f'line {n}: expected a set declaration or a relation, got `{line}`')
+        relation(records, sets, names, match.group(1), OPERATORS[match.group(2)], match.group(3), n)
+    return Compiled(sets, records)
+
+def terms(text: str, names: dict, n: int) -> list[tuple[int, int, 'str|None']]:
+    # (set position, item index, foreign set name or None) for every `&` joined term
+    result = []
+    for part in text.split('&'):
+        match = TERM.fullmatch(part.strip())
+        if not match:
+            raise Exception(f'line {n}: expected `set[item]` or `set[item](set)`, got `{part.strip()}`')
+        name, token, foreign = match.groups()
+        if name not in names:
+            raise Exception(f'line {n}: unknown set `{name}`')
+        if token not in names[name][1]:
+            raise Exception(f'line {n}: unknown item `{token}` of `{name}`')
+        if foreign is not None and foreign not in names:
+            raise Exception(f'line {n}: unknown set `{foreign}`')
+        result.append((names[name][0], names[name][1][token], foreign))
+    return result
+
+def relation(records: array, sets: list, names: dict, left: str, ty: str, right: str, n: int):
+    # mirrors the semantics of the operators in `sets.py`
+    a = terms(left, names, n)
+    if any(f is not None for _, _, f in a):
+        if len(a) > 1:
+            raise Exception(f'line {n}: foreign sets cannot be joined with `&`')
+        s, i, f = a[0]
+        if names[f][0] == s:
+            raise Exception(f'line {n}: an item has no foreign set of its own set')
+        if '[' not in right:
+            # a plain item of the foreign set
+            if right not in names[f][1]:
+                raise Exception(f'line {n}: unknown item `{right}` of `{f}`')
+            a, b = [(s, i, None)], [(names[f][0], names[f][1][right], None)]
+        else:
+            b = terms(right, names, n)
+            if len(b) > 1 or b[0][2] is None:
+                raise Exception(f'line {n}: a foreign set can only be compared to a foreign set or an item of it')
+            if b[0][2] != f:
+                raise Exception(f'line {n}: cannot compare two different foreign sets')
+            t, j, _ = b[0]
+            if s == t:
+                raise Exception(f'line {n}: cannot create constraint on two items of same set')
+            if ty in ('eq', 'ne'):
+                # the two native items correspond (or not), an item relation
+                records.extend((TYPES.index(ty), s, i, t, j, -1))
+            else:
+                # no item is shared, so the two native items additionally must be disjoint
+                records.extend((TYPES.index(ty), s, i, t, j, names[f][0]))
+                records.extend((TYPES.index('ne'), s, i, t, j, -1))
+            return
+    else:
+        b = terms(right, names, n)
+        if any(f is not None for _, _, f in b):
+            raise Exception(f'line {n}: an item cannot be compared to a foreign set')
+    if (len(a) > 1 or len(b) > 1) and ty == 'eq':
+        raise Exception(f'line {n}: cannot relate multiple items to one with equality')
+    if ty not in ('eq', 'ne') and (len(b) > 1 or not sets[b[0][0]][1]):
+        raise Exception(f'line {n}: cannot create comparative constraint on an unordered right hand side')
+    for s, i, _ in a:
+        for t, j, _ in b:
+            if s == t:
+                raise Exception(f'line {n}: cannot create constraint on two items of same set')
+            records.extend((TYPES.index(ty), s, i, t, j, -1))
+
+def load(path: str) -> Compiled:
+    # memory-maps a compiled puzzle, the map stays open as long as the records are referenced
+    with open(path, 'rb') as f:
+        return Compiled.loads(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+def save(compiled: Compiled, path: str):
+    # written to a temporary file which replaces `path` at once, a file mapped by `load` is never truncated in place
+    temporary = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    try:
+        with open(temporary, 'wb') as f:
+            f.write(compiled.dumps())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.unlink(temporary)
+        raise
+
+def cached(path: str) -> Compiled:
+    # compiles a text puzzle, reusing `<path>c` as long as it is newer than the text
+    target = path + 'c'
+    if os.path.exists(target) and os.path.getmtime(target) >= os.path.getmtime(path):
+        return load(target)
+    with open(path) as f:
+        compiled = parse(f.read())
+    save(compiled, target)
+    return compiled
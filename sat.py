@@ -0,0 +1,357 @@
+import heapq
+from solver import Solver, SolveTimeout
+from bits import bit
+
+# A small CDCL SAT solver: two watched literals, first UIP clause learning with non-chronological backjumping,
+# VSIDS branching, phase saving and Luby restarts.
+# Variables are positive integers, literals are +v / -v like in DIMACS.
+
+def luby(i: int) -> int:
+    # i-th element (starting at 1) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 ...
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    while i != (1 << k) - 1:
+        i -= (1 << (k - 1)) - 1
+        k = 1
+        while (1 << k) - 1 < i:
+            k += 1
+    return 1 << (k - 1)
+
+class Sat:
+    def __init__(self):
+        self.n = 0
+        self.clauses: list[list[int]] = []
+        self.units: list[int] = []
+        self.empty = False
+        self.conflicts = 0
+        self.decisions = 0
+
+    def var(self) -> int:
+        self.n += 1
+        return self.n
+
+    def add(self, clause: list[int]):
+        clause = list(dict.fromkeys(clause))
+        if any(-l in clause for l in clause):
+            return
+        if not clause:
+            self.empty = True
+        elif len(clause) == 1:
+            self.units.append(clause[0])
+        else:
+            self.clauses.append(clause)
+
+    def solve(self, restart_base: int = 100, stop=None) -> 'dict[int, bool]|None':
+        # returns a model as {variable: value} or None if the clauses are unsatisfiable
+        # or `stop`, checked after every conflict, returned True
+        if self.empty:
+            return None
+        n = self.n
+        self.value = [0] * (n + 1)
+        self.level = [0] * (n + 1)
+        self.reason: list = [None] * (n + 1)
+        self.phase = [False] * (n + 1)
+        self.activity = [0.0] * (n + 1)
+        self.increment = 1.0
+        self.heap = [(0.0, v) for v in range(1, n + 1)]
+        self.trail: list[int] = []
+        self.limits: list[int] = []
+        self.head = 0
+        # watches[l] holds the clauses watching literal l, literal l is stored at index l + n
+        self.watches: list[list[list[int]]] = [[] for _ in range(2 * n + 1)]
+        for c in self.clauses:
+            self.watches[c[0] + n].append(c)
+            self.watches[c[1] + n].append(c)
+        for l in self.units:
+            if self.literal(l) < 0:
+                return None
+            if self.literal(l) == 0:
+                self.assign(l, None)
+        restarts = 1
+        budget = luby(restarts) * restart_base
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                if not self.limits or (stop is not None and stop()):
+                    return None
+                learnt, level = self.analyze(conflict)
+                self.backtrack(level)
+                if len(learnt) == 1:
+                    self.assign(learnt[0], None)
+                else:
+                    self.watches[learnt[0] + n].append(learnt)
+                    self.watches[learnt[1] + n].append(learnt)
+                    self.clauses.append(learnt)
+                    self.assign(learnt[0], learnt)
+                self.increment *= 1.05
+                budget -= 1
+                continue
+            if budget <= 0:
+                restarts += 1
+                budget = luby(restarts) * restart_base
+                self.backtrack(0)
+                continue
+            v = self.pick()
+            if v is None:
+                return {v: self.value[v] > 0 for v in range(1, n + 1)}
+            self.decisions += 1
+            self.limits.append(len(self.trail))
+            self.assign(v if self.phase[v] else -v, None)
+
+    def literal(self, l: int) -> int:
+        # 1 if true, -1 if false, 0 if unassigned
+        return self.value[l] if l > 0 else -self.value[-l]
+
+    def assign(self, l: int, reason):
+        v = abs(l)
+        self.value[v] = 1 if l > 0 else -1
+        self.level[v] = len(self.limits)
+        self.reason[v] = reason
+        self.trail.append(l)
+
+    def propagate(self) -> 'list[int]|None':
+        n = self.n
+        value = self.value
+        while self.head < len(self.trail):
+            false = -self.trail[self.head]
+            self.head += 1
+            watching = self.watches[false + n]
+            kept = []
+            i = 0
+            while i < len(watching):
+                c = watching[i]
+                i += 1
+                if c[0] == false:
+                    c[0], c[1] = c[1], c[0]
+                first = c[0]
+                if (value[first] if first > 0 else -value[-first]) > 0:
+                    kept.append(c)
+                    continue
+                for k in range(2, len(c)):
+                    l = c[k]
+                    if (value[l] if l > 0 else -value[-l]) >= 0:
+                        c[1], c[k] = l, false
+                        self.watches[l + n].append(c)
+                        break
+                else:
+                    kept.append(c)
+                    if (value[first] if first > 0 else -value[-first]) < 0:
+                        kept.extend(watching[i:])
+                        self.watches[false + n] = kept
+                        return c
+                    self.assign(first, c)
+            self.watches[false + n] = kept
+        return None
+
+    def analyze(self, conflict: list[int]) -> tuple[list[int], int]:
+        # first UIP, returns the learnt clause (asserting literal first) and the level to jump back to
+        current = len(self.limits)
+        seen = set()
+        learnt = [0]
+        counter = 0
+        clause = conflict
+        index = len(self.trail) - 1
+        while True:
+            for l in clause:
+                v = abs(l)
+                if v in seen or self.level[v] == 0:
+                    continue
+                seen.add(v)
+                self.bump(v)
+                if self.level[v] == current:
+                    counter += 1
+                else:
+                    learnt.append(l)
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            p = self.trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            seen.discard(abs(p))
+            clause = [l for l in self.reason[abs(p)] if l != p]
+        learnt[0] = -p
+        if len(learnt) == 1:
+            return learnt, 0
+        # the literal of the highest remaining level is watched second
+        best = max(range(1, len(learnt)), key=lambda k: self.level[abs(learnt[k])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, self.level[abs(learnt[1])]
+
+    def backtrack(self, level: int):
+        if len(self.limits) <= level:
+            return
+        start = self.limits[level]
+        for l in self.trail[start:]:
+            v = abs(l)
+            self.phase[v] = l > 0
+            self.value[v] = 0
+            self.reason[v] = None
+            heapq.heappush(self.heap, (-self.activity[v], v))
+        del self.trail[start:]
+        del self.limits[level:]
+        self.head = min(self.head, start)
+
+    def bump(self, v: int):
+        self.activity[v] += self.increment
+        if self.activity[v] > 1e100:
+            self.activity = [a * 1e-100 for a in self.activity]
+            self.increment *= 1e-100
+            self.heap = [(-self.activity[u], u) for u in range(1, self.n + 1) if not self.value[u]]
+            heapq.heapify(self.heap)
+        elif not self.value[v]:
+            heapq.heappush(self.heap, (-self.activity[v], v))
+
+    def pick(self) -> 'int|None':
+        # unassigned variable of highest activity, stale heap entries are skipped
+        while self.heap:
+            _, v = heapq.heappop(self.heap)
+            if not self.value[v]:
+                return v
+        return None
+
+# The sat engine encodes the model relative to the rows of its first set (the reference set):
+# one variable per (item, reference item) candidate, exactly one per item and per row.
+# The remaining candidates of all other pairs and the ordered relations are added as clauses,
+# ordered values use an order encoding (`value >= k` ladders).
+
+class SatSolver(Solver):
+    def run(self, max_iter, search, workers):
+        # the search is complete anyway, `search` and `workers` are accepted for compatibility
+        self.propagate(max_iter)
+        if self.queue and self.conflict is None and self.expired():
+            raise SolveTimeout(self)
+        if self.conflict is None and self.choose() is not None:
+            self.sat = Sat()
+            self.encode()
+            model = self.sat.solve(stop=self.expired)
+            if model is None and self.expired():
+                raise SolveTimeout(self)
+            if model is None:
+                raise ArithmeticError('The model is not solvable since the relations contradict each other')
+            # the assignment is undone again after reading the solution, like the decisions of a search
+            mark = len(self.trail)
+            self.decode(model)
+            self.propagate()
+            solution = self.solution()
+            self.undo(mark)
+            return solution
+        return self.solution()
+
+    def clause(self, literals: list):
+        # literals may be the constants True and False, compared by identity since 1 == True
+        if not any(l is True for l in literals):
+            self.sat.add([l for l in literals if l is not False])
+
+    def exactly_one(self, literals: list):
+        literals = [l for l in literals if l is not False]
+        self.clause(literals)
+        if len(literals) <= 5:
+            for i in range(len(literals)):
+                for j in range(i + 1, len(literals)):
+                    self.clause([-literals[i], -literals[j]])
+            return
+        # sequential counter, s_i: one of the first i + 1 literals is true
+        previous = literals[0]
+        for l in literals[1:]:
+            s = self.sat.var()
+            self.clause([-previous, s])
+            self.clause([-l, s])
+            self.clause([-previous, -l])
+            previous = s
+
+    def at(self, name: str, i: int, r: int):
+        # literal of `item i of set name corresponds to row r`, or a constant
+        if name == self.reference.name:
+            return i == r
+        l = self.rows[name, i][r]
+        return False if l is None else l
+
+    def encode(self):
+        sets = list(self.super_sets.values())
+        self.reference = sets[0]
+        n = len(self.reference.items)
+        self.rows = {}
+        for ss in sets[1:]:
+            columns = self.reference.pairs[ss.name][0].domains(1)
+            for s in range(n):
+                self.rows[ss.name, s] = [self.sat.var() if columns[s] >> r & 1 else None for r in range(n)]
+            for s in range(n):
+                self.exactly_one([self.at(ss.name, s, r) for r in range(n)])
+            for r in range(n):
+                self.exactly_one([self.at(ss.name, s, r) for s in range(n)])
+        # removed candidates between two sets which are not the reference set
+        for pair in self.pairs:
+            if pair.a is self.reference:
+                continue
+            for a, m in enumerate(pair.rows):
+                for b in range(n):
+                    if not m >> b & 1:
+                        for r in range(n):
+                            self.clause([negate(self.at(pair.a.name, a, r)), negate(self.at(pair.b.name, b, r))])
+        self.orders = {}
+        for r in self.relations:
+            a, b = self.order(r.a), self.order(r.b)
+            m = len(a) - 1
+            for k in range(m):
+                if r.ty == 'lt':
+                    self.implies(a[k], b[k + 1])
+                elif r.ty == 'le':
+                    self.implies(a[k], b[k])
+                elif r.ty == 'gt':
+                    self.implies(b[k], a[k + 1])
+                elif r.ty == 'ge':
+                    self.implies(b[k], a[k])
+
+    def implies(self, a, b):
+        self.clause([negate(a), b])
+
+    def value(self, name: str, i: int, ordered: str) -> list:
+        # literals of `item i of set name corresponds to item k of the ordered set` for every k
+        n = len(self.reference.items)
+        if ordered == self.reference.name:
+            return [self.at(name, i, k) for k in range(n)]
+        if name == self.reference.name:
+            return [self.at(ordered, k, i) for k in range(n)]
+        mask = self.super_sets[name].foreign_list[i].get(ordered)
+        values = []
+        for k in range(n):
+            if not mask >> k & 1:
+                values.append(False)
+                continue
+            v = self.sat.var()
+            for r in range(n):
+                x, o = self.at(name, i, r), self.at(ordered, k, r)
+                self.clause([negate(x), negate(o), v])
+                self.clause([-v, negate(x), o])
+            values.append(v)
+        return values
+
+    def order(self, side) -> list:
+        # ge[k] means the value of the foreign set is at least its k-th item, ge[0] is always true and ge[n] always false
+        key = (side.item.set.name, side.item.index, side.set.name)
+        if key not in self.orders:
+            values = self.value(side.item.set.name, side.item.index, side.set.name)
+            n = len(values)
+            ge = [True] + [self.sat.var() for _ in range(n - 1)] + [False]
+            for k in range(n):
+                self.implies(ge[k + 1], ge[k])
+                self.implies(values[k], ge[k])
+                self.clause([negate(values[k]), negate(ge[k + 1])])
+                self.clause([negate(ge[k]), ge[k + 1], values[k]])
+            self.orders[key] = ge
+        return self.orders[key]
+
+    def decode(self, model: dict[int, bool]):
+        for (name, s), literals in self.rows.items():
+            for r, l in enumerate(literals):
+                if l is not None and model[l]:
+                    self.reference.foreign_list[r].keep(name, bit(s))
+
+def negate(l):
+    if l is True or l is False:
+        return not l
+    return -l
@@ -1,9 +1,15 @@
 from typing import Callable, Any
 from itertools import combinations
+from bits import bit, below, lowest, highest
 
 RELATION_TYPES = {'eq': '==', 'ne': '!=', 'lt': '<', 'le': '<=', 'gt': '>', 'ge': '>='}
+# swapping the sides of a foreign comparison turns it into its mirror image
+MIRRORED = {'gt': 'lt', 'ge': 'le'}
 
 class Item:
+    # items are interned by their set (`Set.__getitem__`), `index` is the position of the value in the set
+    __slots__ = ('set', 'value', 'listing', 'index')
+
     def relation(self, other: 'Item', call: Callable, op: str):
         if self.listing:
             if op == 'eq':
@@ -17,10 +23,11 @@ class Item:
             raise Exception(f'Cannot create constraint on two items of same set {self} {RELATION_TYPES[op]} {other}')
         return Relation(self, other, op)
         
-    def __init__(self, set_: 'Set', value, listing = None):
+    def __init__(self, set_: 'Set', value, listing = None, index: int = None):
         self.set = set_
         self.value = value
         self.listing = listing
+        self.index = index
     
     def __call__(self, foreign: 'Set') -> 'ForeignSet':
         return ForeignSet(self, foreign)
@@ -63,11 +70,16 @@ class Item:
             raise Exception(f'Cannot create comparative constraint on an unordered right hand side {self} >= {other}')
         return self.relation(other, lambda a, b: a >= b, 'ge')
 
+    # `==` builds relations, so items hash by identity, which is equality since they are interned
+    __hash__ = object.__hash__
+
     def __repr__(self) -> str:
         return f'{self.set.name}[{self.value}]'
         
 
 class ForeignSet:
+    __slots__ = ('item', 'set')
+
     def __init__(self, item: Item, set_: 'Set'):
         self.item = item
         self.set = set_
@@ -124,6 +136,8 @@ class ForeignSet:
         return f'{self.item.set.name}[{self.item.value}]({self.set.name})'
 
 class Relation:
+    __slots__ = ('a', 'b', 'ty')
+
     def __init__(self, a: Item, b: Item, ty: str) -> None:
         self.a = a
         self.b = b
@@ -131,92 +145,68 @@ class Relation:
 
     def __repr__(self) -> str:
         return f'{self.a} {RELATION_TYPES[self.ty]} {self.b}'
+
+    def normalized(self) -> tuple[str, Item, Item, 'Set|None']:
+        # (type, item, item, foreign set or None), equal for equivalent relations:
+        # the items of (in)equalities are sorted, foreign comparisons always point the same way
+        if isinstance(self.a, Item):
+            a, b = self.a, self.b
+            if self.ty in ('eq', 'ne') and (b.set.name, b.index) < (a.set.name, a.index):
+                a, b = b, a
+            return self.ty, a, b, None
+        if self.ty in MIRRORED:
+            return MIRRORED[self.ty], self.b.item, self.a.item, self.a.set
+        return self.ty, self.a.item, self.b.item, self.a.set
     
     def evalulate_immediate(self, super_sets):
         if isinstance(self.a, ForeignSet):
             raise Exception(f'Cannot only evaluate foreign relation recurringly')
-        set_ab = super_sets[self.a.set.name].foreign_sets[self.a.value].foreigns[self.b.set.name]
+        f_a = super_sets[self.a.set.name].foreign_list[self.a.index]
+        f_b = super_sets[self.b.set.name].foreign_list[self.b.index]
+        # ordered sets are sorted, so comparing values is the same as comparing bit positions
+        i = self.b.index
+        key = self.b.set.name
         if self.ty == 'eq':
-            set_ab.clear()
-            set_ab.append(self.b.value)
-            super_sets[self.b.set.name].foreign_sets[self.b.value].foreigns[self.a.set.name] = [self.a.value]
+            f_a.keep(key, bit(i))
+            f_b.keep(self.a.set.name, f_a.bit)
         elif self.ty == 'ne':
-            if self.b.value in set_ab:
-                set_ab.remove(self.b.value)
-            if self.a.value in super_sets[self.b.set.name].foreign_sets[self.b.value].foreigns[self.a.set.name]:
-                super_sets[self.b.set.name].foreign_sets[self.b.value].foreigns[self.a.set.name].remove(self.a.value)
+            f_a.remove(key, bit(i))
         elif self.ty == 'gt':
-            while set_ab[0] <= self.b.value:
-                k = set_ab.pop(0)
-                if k in super_sets[self.b.set.name].foreign_sets[k].foreigns[self.a.set.name]:
-                    super_sets[self.b.set.name].foreign_sets[k].foreigns[self.a.set.name].remove(self.a.value)
+            f_a.remove(key, below(i + 1))
         elif self.ty == 'ge':
-            while set_ab[0] < self.b.value:
-                k = set_ab.pop(0)
-                if k in super_sets[self.b.set.name].foreign_sets[k].foreigns[self.a.set.name]:
-                    super_sets[self.b.set.name].foreign_sets[k].foreigns[self.a.set.name].remove(self.a.value)
+            f_a.remove(key, below(i))
         elif self.ty == 'lt':
-            while set_ab[-1] >= self.b.value:
-                k = set_ab.pop()
-                if k in super_sets[self.b.set.name].foreign_sets[k].foreigns[self.a.set.name]:
-                    super_sets[self.b.set.name].foreign_sets[k].foreigns[self.a.set.name].remove(self.a.value)
+            f_a.keep(key, below(i))
         elif self.ty == 'le':
-            while set_ab[-1] > self.b.value:
-                k = set_ab.pop()
-                if k in super_sets[self.b.set.name].foreign_sets[k].foreigns[self.a.set.name]:
-                    super_sets[self.b.set.name].foreign_sets[k].foreigns[self.a.set.name].remove(self.a.value)
+            f_a.keep(key, below(i + 1))
         else:
             Exception(f'Invalid or unreachable immediate relation type `{self.ty}`')
     
     def evalulate_recurring(self, super_sets):
         if isinstance(self.a, Item):
             raise Exception(f'Cannot only evaluate item relation immediately')
-        set_a = super_sets[self.a.item.set.name].foreign_sets[self.a.item.value].foreigns[self.a.set.name]
-        set_b = super_sets[self.b.item.set.name].foreign_sets[self.b.item.value].foreigns[self.b.set.name]
+        f_a = super_sets[self.a.item.set.name].foreign_list[self.a.item.index]
+        f_b = super_sets[self.b.item.set.name].foreign_list[self.b.item.index]
+        key = self.a.set.name
+        # an empty side is already a contradiction, which is reported by the completeness check
+        if not f_a.get(key) or not f_b.get(key):
+            return
         if self.ty == 'gt':
-            m = min(set_b)
-            while set_a[0] <= m:
-                k = set_a.pop(0)
-                if self.a.item.value in super_sets[self.a.set.name].foreign_sets[k].foreigns[self.a.item.set.name]:
-                    super_sets[self.a.set.name].foreign_sets[k].foreigns[self.a.item.set.name].remove(self.a.item.value)
-            m = max(set_a)
-            while set_b[-1] >= m:
-                k = set_b.pop()
-                if self.b.item.value in super_sets[self.b.set.name].foreign_sets[k].foreigns[self.b.item.set.name]:
-                    super_sets[self.b.set.name].foreign_sets[k].foreigns[self.b.item.set.name].remove(self.b.item.value)
+            f_a.remove(key, below(lowest(f_b.get(key)) + 1))
+            if f_a.get(key):
+                f_b.keep(key, below(highest(f_a.get(key))))
         elif self.ty == 'ge':
-            m = min(set_b)
-            while set_a[0] < m:
-                k = set_a.pop(0)
-                if self.a.item.value in super_sets[self.a.set.name].foreign_sets[k].foreigns[self.a.item.set.name]:
-                    super_sets[self.a.set.name].foreign_sets[k].foreigns[self.a.item.set.name].remove(self.a.item.value)
-            m = max(set_a)
-            while set_b[-1] > m:
-                k = set_b.pop()
-                if self.b.item.value in super_sets[self.b.set.name].foreign_sets[k].foreigns[self.b.item.set.name]:
-                    super_sets[self.b.set.name].foreign_sets[k].foreigns[self.b.item.set.name].remove(self.b.item.value)
+            f_a.remove(key, below(lowest(f_b.get(key))))
+            if f_a.get(key):
+                f_b.keep(key, below(highest(f_a.get(key)) + 1))
         elif self.ty == 'lt':
-            m = max(set_b)
-            while set_a[-1] >= m:
-                k = set_a.pop()
-                if self.a.item.value in super_sets[self.a.set.name].foreign_sets[k].foreigns[self.a.item.set.name]:
-                    super_sets[self.a.set.name].foreign_sets[k].foreigns[self.a.item.set.name].remove(self.a.item.value)
-            m = min(set_a)
-            while set_b[0] <= m:
-                k = set_b.pop(0)
-                if self.b.item.value in super_sets[self.b.set.name].foreign_sets[k].foreigns[self.b.item.set.name]:
-                    super_sets[self.b.set.name].foreign_sets[k].foreigns[self.b.item.set.name].remove(self.b.item.value)
+            f_a.keep(key, below(highest(f_b.get(key))))
+            if f_a.get(key):
+                f_b.remove(key, below(lowest(f_a.get(key)) + 1))
         elif self.ty == 'le':
-            m = max(set_b)
-            while set_a[-1] > m:
-                k = set_a.pop()
-                if self.a.item.value in super_sets[self.a.set.name].foreign_sets[k].foreigns[self.a.item.set.name]:
-                    super_sets[self.a.set.name].foreign_sets[k].foreigns[self.a.item.set.name].remove(self.a.item.value)
-            m = min(set_a)
-            while set_b[0] < m:
-                k = set_b.pop(0)
-                if self.b.item.value in super_sets[self.b.set.name].foreign_sets[k].foreigns[self.b.item.set.name]:
-                    super_sets[self.b.set.name].foreign_sets[k].foreigns[self.b.item.set.name].remove(self.b.item.value)
+            f_a.keep(key, below(highest(f_b.get(key)) + 1))
+            if f_a.get(key):
+                f_b.remove(key, below(lowest(f_a.get(key))))
         else:
             Exception(f'Invalid or unreachable recurring relation type `{self.ty}`')
 
@@ -224,11 +214,11 @@ class Set:
     def __init__(self, name: str, items: list):
         self.name = name
         self.items = items
+        self.index = {v: i for i, v in enumerate(items)}
+        self.interned = [Item(self, v, index=i) for i, v in enumerate(items)]
     
     def __getitem__(self, item) -> Item:
-        if item in self.items:
-            return Item(self, item)
-        raise KeyError
+        return self.interned[self.index[item]]
     
     def copy(self) -> 'Set':
         return Set(self.name, self.items.copy())
@@ -1,4 +1,11 @@
 from sets import Set, Relation, Item
+import asyncio
+import threading
+from collections import deque
+from time import perf_counter
+from bits import bit, full, below, lowest, highest, indices, column, transpose
+from matching import supported
+from symmetry import symmetries, multiplicity, expanded
 
 class Model:
     def __init__(self, *sets: Set):
@@ -11,125 +18,504 @@ class Model:
         else:
             self.relations.append(relation)
     
-    def solver(self) -> 'Solver':
-        super_sets = {s.name: SuperSet(s, self.sets) for s in self.sets}
+    def solver(self, engine: str = 'python', symmetry: bool = False) -> 'Solver':
+        if len({len(s.items) for s in self.sets}) > 1:
+            raise Exception('All sets of a model must be of equal size')
+        super_sets = {}
+        for s in self.sets:
+            ss = SuperSet(s, self.sets, super_sets)
+            # candidates of every unordered pair of sets are stored once, shared by both sides
+            for other in super_sets.values():
+                pair = Pair(other, ss)
+                other.pairs[ss.name] = (pair, 0)
+                ss.pairs[other.name] = (pair, 1)
+            super_sets[s.name] = ss
 
-        return Solver(super_sets, self.relations)
+        relations, broken = self.relations, []
+        if symmetry:
+            # interchangeable items are put in order, relations added to the solver later must not tell them apart
+            broken, breaking = symmetries(self)
+            relations = relations + breaking
+        if engine == 'tensor':
+            # numpy is an optional dependency, only needed for the tensor engine
+            from tensor import TensorSolver
+            solver = TensorSolver(super_sets, relations)
+        elif engine == 'sat':
+            from sat import SatSolver
+            solver = SatSolver(super_sets, relations)
+        elif engine == 'python':
+            solver = Solver(super_sets, relations)
+        else:
+            raise Exception(f'Unknown solver engine `{engine}`')
+        solver.symmetries = broken
+        return solver
+
+    def compile(self, engine: str = 'python') -> 'Template':
+        return Template(self.solver(engine))
 
 
 class Solver:
     def __init__(self, super_sets: dict[str, 'SuperSet'], relations: list[Relation]):
+        self.super_sets = super_sets
+        self.pairs = [pair for ss in super_sets.values() for pair, o in ss.pairs.values() if o == 0]
+        self.relations = [r for r in relations if not isinstance(r.a, Item)]
+        # recurring relations watching a domain, keyed by (set, item index, foreign set)
+        self.watchers: dict[tuple, list[Relation]] = {}
+        for r in self.relations:
+            self.watch(r)
+        # propagators waiting to run, deduplicated through `queued`
+        self.queue = deque()
+        self.queued = set()
+        self.propagations = 0
+        # propagators of the current sweep still waiting at the front of the queue
+        self.sweep = 0
+        self.conflict = None
+        # (pair, orientation, index, removed, previous mask) for every domain change, used to undo changes cheaply.
+        # `replace` records (pair, None, 0, 0, previous rows) instead.
+        self.trail: list[tuple['Pair', 'int|None', int, int, 'int|tuple[int, ...]']] = []
+        # (trail length, number of relations, conflict) for every `push`
+        self.levels: list[tuple[int, int, tuple]] = []
+        # checked between search nodes, stops the search once it returns True
+        self.stop = None
+        # wall-clock time (`perf_counter`) after which propagation and search give up, set by `solve(timeout=...)`
+        self.deadline = None
+        # per pass instrumentation, only collected after `instrument`
+        self.stats: 'Stats|None' = None
+        # classes of interchangeable items which are put in order, see `symmetry.py`
+        self.symmetries: list[list[Item]] = []
+        for pair in self.pairs:
+            pair.listener = self.changed
+
         for r in relations:
             if isinstance(r.a, Item):
                 r.evalulate_immediate(super_sets)
-        relations = [r for r in relations if not isinstance(r.a, Item)]
+        self.schedule()
 
-        self.super_sets = super_sets
-        self.relations = relations
-
-    def solve(self, max_iter=8):
-        for _ in range(max_iter):
-            # remove recurring constraints
-            for r in self.relations:
-                r.evalulate_recurring(self.super_sets)
-
-            # search for lonely foreign entry (siblingless)
-            for ss in self.super_sets.values():
-                # looping over foreign sets column wise
-                for k in self.super_sets.values():
-                    key = k.name
-                    if key == ss.name:
-                        continue
-                    lonely = None
-                    # find lonely
-                    for f in ss.foreign_sets.values():
-                        if len(f.foreigns[key]) == 1:
-                            lonely = f.foreigns[key][0]
-                            continue
-                    if lonely:
-                        # remove lonely everywhere else
-                        for kv, f in ss.foreign_sets.items():
-                            if len(f.foreigns[key]) != 1 and lonely in f.foreigns[key]:
-                                f.foreigns[key].remove(lonely)
-                                if kv in self.super_sets[key].foreign_sets[lonely].foreigns[ss.name]:
-                                    self.super_sets[key].foreign_sets[lonely].foreigns[ss.name].remove(kv)
-            # search for unique mentioning of foreign entry
-            for ss in self.super_sets.values():
-                # looping over foreign sets column wise
-                for k in self.super_sets.values():
-                    key = k.name
-                    if key == ss.name:
-                        continue
-                    counts = {}
-                    # find uniques
-                    for f in ss.foreign_sets.values():
-                        for item in f.foreigns[key]:
-                            if item in counts:
-                                counts[item] += 1
-                            else:
-                                counts[item] = 1
-                    # remove siblings of uniques
-                    for c in [c for c, v in counts.items() if v == 1]:
-                        for kv, f in ss.foreign_sets.items():
-                            if c in f.foreigns[key]:
-                                for redundant in [r for r in f.foreigns[key] if r != c]:
-                                    f.foreigns[key].remove(redundant)
-                                    if kv in self.super_sets[key].foreign_sets[redundant].foreigns[ss.name]:
-                                        self.super_sets[key].foreign_sets[redundant].foreigns[ss.name].remove(kv)
-
-            # Inter-ForeignSet search
-            for ss in self.super_sets.values():
-                for ss2 in self.super_sets.values():
-                    if ss == ss2:
-                        continue
-                    for f in ss.foreign_sets.values():
-                        for f2 in ss2.foreign_sets.values():
-                            common = set(f.foreigns.keys()) & set(f2.foreigns.keys())
-                            for k in common:
-                                if len(f.foreigns[k]) == 1 and f.foreigns[k] == f2.foreigns[k]:
-                                    for k2 in common:
-                                        if k2 == k:
-                                            continue
-                                        for i in set(f2.foreigns[k2]) ^ set(f.foreigns[k2]):
-                                            if i in f2.foreigns[k2]:
-                                                f2.foreigns[k2].remove(i)
-                                            if i in self.super_sets[k].foreign_sets[f.foreigns[k][0]].foreigns[k2]:
-                                                self.super_sets[k].foreign_sets[f.foreigns[k][0]].foreigns[k2].remove(i)
-            # ForeignSet to SuperSet propagation
-            for ss in self.super_sets.values():
-                for f in ss.foreign_sets.values():
-                    for k in f.foreigns.keys():
-                        if len(f.foreigns[k]) == 1:
-                            f2 = self.super_sets[k].foreign_sets[f.foreigns[k][0]]
-                            common = set(f.foreigns.keys()) & set(f2.foreigns.keys())
-                            for k2 in common:
-                                for i in set(f.foreigns[k2]) ^ set(f2.foreigns[k2]):
-                                    if i in f2.foreigns[k2]:
-                                        f2.foreigns[k2].remove(i)
-        # check for completeness
+    def schedule(self):
+        # every propagator runs at least once
+        for r in self.relations:
+            self.enqueue(r)
+        for pair in self.pairs:
+            self.enqueue(('pair', pair.a.name, pair.b.name))
+        for ss in self.super_sets.values():
+            for i in range(len(ss.items)):
+                self.enqueue(('item', ss.name, i))
+
+    def watch(self, r: Relation):
+        for side in (r.a, r.b):
+            key = (side.item.set.name, side.item.index, side.set.name)
+            # never appends in place, copies of this solver share the lists
+            self.watchers[key] = self.watchers.get(key, []) + [r]
+
+    def add(self, relation: 'Relation|list[Relation]'):
+        if isinstance(relation, list):
+            for r in relation:
+                self.add(r)
+        elif isinstance(relation.a, Item):
+            relation.evalulate_immediate(self.super_sets)
+        else:
+            self.relations.append(relation)
+            self.watch(relation)
+            self.enqueue(relation)
+
+    def push(self):
+        # opens a level, relations added afterwards and all their deductions are undone by `pop`
+        self.propagate()
+        self.levels.append((len(self.trail), len(self.relations), self.conflict))
+
+    def pop(self):
+        mark, relations, conflict = self.levels.pop()
+        self.undo(mark)
+        self.conflict = conflict
+        for r in self.relations[relations:]:
+            for side in (r.a, r.b):
+                key = (side.item.set.name, side.item.index, side.set.name)
+                self.watchers[key] = [w for w in self.watchers[key] if w is not r]
+        del self.relations[relations:]
+
+    def copy(self) -> 'Solver':
+        # a solver with its own domains and queue, sharing sets, items and relations with this one
+        solver = self.__class__.__new__(self.__class__)
+        solver.__dict__.update(self.__dict__)
+        solver.super_sets = {}
         for ss in self.super_sets.values():
-            for f in ss.foreign_sets.values():
-                for k, i in f.foreigns.items():
-                    if len(i) != 1:
-                        if len(i) > 1:
-                            raise ValueError('Could not solve the model. Either too few interations or the relations were not constraining enough')
-                        raise ArithmeticError(f'The model is not solvable since no {k} satisfies a constraint for {ss.name}')
+            solver.super_sets[ss.name] = ss.copy(solver.super_sets)
+        pairs = {}
+        for pair in self.pairs:
+            pairs[pair] = pair.copy(solver.super_sets[pair.a.name], solver.super_sets[pair.b.name], solver.changed)
+        for ss in solver.super_sets.values():
+            ss.pairs = {k: (pairs[pair], o) for k, (pair, o) in ss.pairs.items()}
+        solver.pairs = list(pairs.values())
+        solver.relations = list(self.relations)
+        solver.watchers = dict(self.watchers)
+        solver.queue = deque(self.queue)
+        solver.queued = set(self.queued)
+        solver.propagations = 0
+        solver.trail = []
+        solver.levels = []
+        solver.stop = None
+        solver.stats = None
+        return solver
+
+    def enqueue(self, propagator):
+        if propagator not in self.queued:
+            self.queued.add(propagator)
+            self.queue.append(propagator)
+
+    def changed(self, pair: 'Pair', o: int, i: int, removed: int):
+        # called for every domain change, enqueues only the propagators watching the changed domains
+        mask = pair.get(o, i)
+        previous = mask | removed
+        self.trail.append((pair, o, i, removed, previous))
+        if self.stats is not None:
+            self.stats.pruned += removed.bit_count()
+        own, other = pair.sides[o], pair.sides[1 - o]
+        self.enqueue(('pair', pair.a.name, pair.b.name))
+        # the recurring relations only compare bounds, they are woken up only if the lowest or highest candidate is gone
+        self.notify(own, i, other.name, mask, removed & (previous & -previous | 1 << highest(previous)))
+        # the domains on the other side lost candidate i, columns are only built for the affected ones
+        masks = transpose(pair.rows, len(pair.b.items), removed) if o == 0 else pair.rows
+        for j in indices(removed):
+            mask = masks[j]
+            self.notify(other, j, own.name, mask, not mask & below(i) or not mask >> i)
+
+    def notify(self, ss: 'SuperSet', i: int, key: str, mask: int, bounds: bool):
+        if not mask:
+            self.conflict = (ss.name, ss.items[i], key)
+        self.enqueue(('item', ss.name, i))
+        if bounds:
+            for r in self.watchers.get((ss.name, i, key), ()):
+                self.enqueue(r)
+
+    def instrument(self, callback=None) -> 'Stats':
+        # `callback(solver, name, seconds, pruned)` is called after every pass
+        self.stats = Stats(callback)
+        return self.stats
+
+    def propagate(self, max_iter=None, max_propagations=None) -> int:
+        # runs the queued propagators until no domain changes anymore and returns the number of sweeps started.
+        # A sweep runs every propagator queued when it starts (the first one everything), `max_iter` caps the sweeps
+        # and `max_propagations` the propagator runs of this call, an interrupted sweep is continued by the next call.
+        stats = self.stats
+        iteration = None
+        if stats is not None and self.sweep:
+            # an interrupted sweep keeps recording into its iteration
+            iteration = stats.iterations[-1] if stats.iterations else stats.begin()
+        sweeps = 0
+        runs = 0
+        while self.queue and self.conflict is None:
+            if not self.sweep:
+                if max_iter is not None and sweeps >= max_iter:
+                    break
+                sweeps += 1
+                self.sweep = len(self.queue)
+                if stats is not None:
+                    iteration = stats.begin()
+            if max_propagations is not None and runs >= max_propagations:
+                break
+            # the clock is only read every 64 propagations
+            if self.deadline is not None and not runs & 63 and self.expired():
+                break
+            propagator = self.queue.popleft()
+            self.queued.discard(propagator)
+            self.sweep -= 1
+            runs += 1
+            self.propagations += 1
+            if stats is not None:
+                self.measure(propagator, iteration)
+            else:
+                self.apply(propagator)
+        return sweeps
+
+    def apply(self, propagator):
+        if isinstance(propagator, Relation):
+            propagator.evalulate_recurring(self.super_sets)
+        elif propagator[0] == 'pair':
+            self.alldifferent(self.super_sets[propagator[1]].pairs[propagator[2]][0])
+        else:
+            ss = self.super_sets[propagator[1]]
+            self.link(ss, ss.foreign_list[propagator[2]])
+
+    def measure(self, propagator, iteration: dict):
+        name = 'relations' if isinstance(propagator, Relation) else 'alldifferent' if propagator[0] == 'pair' else 'link'
+        pruned = self.stats.pruned
+        start = perf_counter()
+        self.apply(propagator)
+        self.stats.record(self, iteration, name, perf_counter() - start, self.stats.pruned - pruned)
+
+    def alldifferent(self, pair: 'Pair'):
+        # keeps only candidates which are part of some 1:1 correspondence between the two sets
+        rows = pair.rows
+        for i, m in enumerate(supported(rows, pair.match)):
+            if m != rows[i]:
+                pair.remove(0, i, ~m)
+                if self.conflict is not None:
+                    return
+
+    def link(self, ss: 'SuperSet', f: 'ForeignSet'):
+        # an item fixed to a foreign item shares all other candidates with it
+        for k in ss.foreign_keys:
+            m = f.get(k)
+            if m.bit_count() == 1:
+                other = self.super_sets[k]
+                f2 = other.foreign_list[lowest(m)]
+                for k2 in ss.foreign_keys:
+                    if k2 != k:
+                        # every domain is read once, most of them already agree
+                        a, b = f.get(k2), f2.get(k2)
+                        if a != b:
+                            f2.keep(k2, a)
+                            f.keep(k2, b)
+
+    def undo(self, mark: int):
+        # restores all domains to the state when the trail had length `mark`
+        while len(self.trail) > mark:
+            pair, o, i, removed, previous = self.trail.pop()
+            if o is None:
+                pair.load(previous)
+            else:
+                pair.restore(o, i, removed, previous)
+        self.queue.clear()
+        self.queued.clear()
+        self.sweep = 0
+        self.conflict = None
+
+    def snapshot(self) -> tuple[int, ...]:
+        # the rows of all pairs as a flat tuple of masks, cheap to pickle
+        return tuple(m for pair in self.pairs for m in pair.rows)
+
+    def restore(self, snapshot: tuple[int, ...]):
+        # loads the domains of a snapshot on top of the trail, open levels and marks stay valid
+        n = 0
+        for pair in self.pairs:
+            self.replace(pair, snapshot[n:n + len(pair.rows)])
+            n += len(pair.rows)
+        self.queue.clear()
+        self.queued.clear()
+        self.sweep = 0
+        self.conflict = None
+        self.schedule()
+
+    def replace(self, pair: 'Pair', rows: tuple[int, ...]):
+        # replaces all candidates of a pair at once, undone by `undo` like any other change
+        rows = tuple(rows)
+        if rows != tuple(pair.rows):
+            self.trail.append((pair, None, 0, 0, tuple(pair.rows)))
+            pair.load(rows)
+
+    def choose(self) -> 'tuple[ForeignSet, str]|None':
+        # the open domain with the fewest remaining candidates (MRV)
+        best = None
+        size = None
+        for pair in self.pairs:
+            for o in (0, 1):
+                for i, m in enumerate(pair.domains(o)):
+                    c = m.bit_count()
+                    if c > 1 and (size is None or c < size):
+                        best, size = (pair.sides[o].foreign_list[i], pair.sides[1 - o].name), c
+                        if c == 2:
+                            return best
+        return best
+
+    def branches(self):
+        # depth first search, propagating after every decision, yields whenever all domains are fixed
+        self.propagate()
+        if self.conflict is not None or self.expired() or (self.stop is not None and self.stop()):
+            return
+        choice = self.choose()
+        if choice is None:
+            yield
+            return
+        f, key = choice
+        for i in indices(f.get(key)):
+            mark = len(self.trail)
+            f.keep(key, bit(i))
+            yield from self.branches()
+            self.undo(mark)
+
+    def solutions(self, expand=False):
+        # lazily yields every solution, the domains are restored once the generator is exhausted or closed
+        # with broken symmetries only one solution of every permutation group is found, `expand` yields all of them
+        self.propagate()
+        if self.conflict is not None:
+            return
+        mark = len(self.trail)
+        try:
+            for _ in self.branches():
+                if expand and self.symmetries:
+                    yield from expanded(self.solution(), self.symmetries)
+                else:
+                    yield self.solution()
+        finally:
+            self.undo(mark)
+
+    def count(self, limit=None) -> int:
+        # number of solutions, stops searching once `limit` is reached
+        # every solution found with broken symmetries stands for all permutations of the interchangeable items
+        step = multiplicity(self.symmetries)
+        n = 0
+        for _ in self.solutions():
+            n += step
+            if limit is not None and n >= limit:
+                return limit
+        return n
+
+    def is_unique(self) -> bool:
+        return self.count(limit=2) == 1
+
+    def solve(self, max_iter=None, search=False, workers=None, timeout=None):
+        # propagates until no domain changes anymore, `max_iter` optionally caps the number of sweeps (see `propagate`)
+        # with `search` the solver branches on open domains instead of giving up
+        # with `workers` the search tree is split across that many processes
+        # with `timeout` (seconds) a `SolveTimeout` is raised once the budget is spent, the solver keeps the partial state reached so far
+        self.deadline = None if timeout is None else perf_counter() + timeout
+        try:
+            return self.run(max_iter, search, workers)
+        finally:
+            self.deadline = None
+
+    def run(self, max_iter, search, workers):
+        # `solve` without the deadline bookkeeping, overridden by the other engines
+        if workers:
+            from parallel import solve_parallel
+            return solve_parallel(self, workers)
+        if search:
+            # the decisions of the search are undone again, only the propagated state is kept
+            self.propagate()
+            mark = len(self.trail)
+            for _ in self.branches():
+                solution = self.solution()
+                self.undo(mark)
+                return solution
+            if self.expired():
+                raise SolveTimeout(self)
+            raise ArithmeticError('The model is not solvable since every branch leads to a contradiction')
+        self.propagate(max_iter)
+        if self.queue and self.conflict is None and self.expired():
+            raise SolveTimeout(self)
+        return self.solution()
+
+    async def solve_async(self, max_iter=None, search=False, timeout=None, executor=None, chunk=256):
+        # `solve` for event loops: the python engine propagates in chunks of `chunk` propagators and yields to the loop in between,
+        # a search and the engines overriding `run` call `solve` in `executor` (the loop's default one if None).
+        # Cancelling the task stops the search at its next node.
+        remaining = timeout
+        if type(self).run is Solver.run:
+            self.deadline = None if timeout is None else perf_counter() + timeout
+            try:
+                sweeps = 0
+                while self.queue and self.conflict is None and not self.expired():
+                    if max_iter is not None and sweeps >= max_iter and not self.sweep:
+                        break
+                    sweeps += self.propagate(None if max_iter is None else max_iter - sweeps, chunk)
+                    await asyncio.sleep(0)
+                if self.queue and self.conflict is None and self.expired():
+                    raise SolveTimeout(self)
+                remaining = None if timeout is None else self.deadline - perf_counter()
+            finally:
+                self.deadline = None
+            if not search or self.conflict is not None or self.choose() is None:
+                return self.solution()
+        cancelled = threading.Event()
+        previous = self.stop
+        def run():
+            # the previous stop hook is restored by the executor, the search may outlive a cancelled task for one node
+            self.stop = lambda: cancelled.is_set() or (previous is not None and previous())
+            try:
+                return self.solve(max_iter=max_iter, search=search, timeout=remaining)
+            finally:
+                self.stop = previous
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, run)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+
+    def expired(self) -> bool:
+        return self.deadline is not None and perf_counter() > self.deadline
+
+    def solution(self) -> 'Solution':
+        # check for contradictions first, propagation stops at the first one
+        for pair in self.pairs:
+            for o in (0, 1):
+                if not all(pair.domains(o)):
+                    raise ArithmeticError(f'The model is not solvable since no {pair.sides[1 - o].name} satisfies a constraint for {pair.sides[o].name}')
+        # check for completeness
+        for pair in self.pairs:
+            for o in (0, 1):
+                for m in pair.domains(o):
+                    if m.bit_count() != 1:
+                        raise ValueError('Could not solve the model. Either too few interations or the relations were not constraining enough')
         return Solution(self.super_sets)
 
     def __repr__(self) -> str:
         return '\n'.join([str(ss) for ss in self.super_sets.values()])
 
+class SolveTimeout(TimeoutError):
+    # raised once the time budget of `solve` is spent, `solver` holds the partially propagated domains
+    def __init__(self, solver: Solver):
+        super().__init__('The time budget was spent before the model was solved')
+        self.solver = solver
+
+class Stats:
+    # the passes of the python engine, the tensor engine runs `transitive` instead of `link`
+    PASSES = ('relations', 'alldifferent', 'link', 'transitive')
+
+    def __init__(self, callback=None):
+        self.callback = callback
+        # candidates removed so far, kept up to date by `Solver.changed`
+        self.pruned = 0
+        # totals per pass, and per pass for every sweep (see `Solver.propagate`)
+        self.total = self.empty()
+        self.iterations: list[dict[str, dict]] = []
+
+    def empty(self) -> dict[str, dict]:
+        return {p: {'time': 0.0, 'pruned': 0, 'runs': 0} for p in Stats.PASSES}
+
+    def begin(self) -> dict[str, dict]:
+        iteration = self.empty()
+        self.iterations.append(iteration)
+        return iteration
+
+    def record(self, solver: Solver, iteration: dict, name: str, seconds: float, pruned: int):
+        for entry in (self.total[name], iteration[name]):
+            entry['time'] += seconds
+            entry['pruned'] += pruned
+            entry['runs'] += 1
+        if self.callback:
+            self.callback(solver, name, seconds, pruned)
+
+    def __repr__(self) -> str:
+        return '\n'.join(f'{name}: {e["runs"]} runs, {e["pruned"]} pruned, {e["time"] * 1000:.3f}ms' for name, e in self.total.items())
+
+class Template:
+    # a propagated model which is never solved itself, every solve works on a cheap copy
+    def __init__(self, solver: Solver):
+        solver.propagate()
+        self.prototype = solver
+
+    def solver(self, *relations: 'Relation|list[Relation]') -> Solver:
+        solver = self.prototype.copy()
+        for r in relations:
+            solver.add(r)
+        return solver
+
 class Solution:
     def __init__(self, super_sets: dict[str, 'SuperSet']):
-        self.super_sets = super_sets
+        # a snapshot, the domains of the solver change again while searching for further solutions
+        self.headings = list(super_sets.keys())
+        ss = list(super_sets.values())[0]
+        self.rows = [(k, *[f.values(key)[0] for key in ss.foreign_keys]) for k, f in ss.foreign_sets.items()]
+
+    def __eq__(self, other: 'Solution') -> bool:
+        return isinstance(other, Solution) and self.headings == other.headings and self.rows == other.rows
+
+    def __hash__(self) -> int:
+        return hash(tuple(self.rows))
 
     def __repr__(self) -> str:
-        headigns = [k for k in self.super_sets.keys()]
-        rows = []
-        ss = list(self.super_sets.values())[0]
-        for (k, f) in ss.foreign_sets.items():
-            row = [k, *[str(v[0]) for v in f.foreigns.values()]]
-            rows.append(row)
+        headigns = self.headings
+        rows = [[str(e) for e in row] for row in self.rows]
         columns = [len(k) for k in headigns]
         for row in rows:
             for i, k in enumerate(row):
@@ -140,18 +526,116 @@ class Solution:
         return '\n'.join(s_rows)
 
 class SuperSet:
-    def __init__(self, set_: Set, sets: list[Set]):
+    def __init__(self, set_: Set, sets: list[Set], super_sets: dict[str, 'SuperSet']):
         self.type = Set.__class__
+        self.set = set_
         self.name = set_.name
-        self.foreign_sets = {i: ForeignSet(i, [s.copy() for s in sets if s is not set_]) for i in set_.items}
+        self.super_sets = super_sets
+        # every item of a set is represented by its bit position in the candidate masks
+        self.items = list(set_.items)
+        self.index = {v: i for i, v in enumerate(self.items)}
+        self.foreign_keys = [s.name for s in sets if s is not set_]
+        # (pair, orientation) for every foreign set, filled in by `Model.solver`
+        self.pairs: dict[str, tuple['Pair', int]] = {}
+        self.foreign_sets = {v: ForeignSet(v, self, i) for i, v in enumerate(self.items)}
+        # the same foreign sets addressed by item index
+        self.foreign_list = list(self.foreign_sets.values())
     
+    def copy(self, super_sets: dict[str, 'SuperSet']) -> 'SuperSet':
+        ss = SuperSet.__new__(SuperSet)
+        ss.__dict__.update(self.__dict__)
+        ss.super_sets = super_sets
+        ss.foreign_sets = {v: ForeignSet(v, ss, f.index) for v, f in self.foreign_sets.items()}
+        ss.foreign_list = list(ss.foreign_sets.values())
+        return ss
+
     def __repr__(self) -> str:
         return self.name + ':\n  ' + '\n  '.join(str(s) for s in self.foreign_sets.values())
 
+class Pair:
+    # candidates between the items of two sets, stored once for both directions as the rows of an n x n matrix:
+    # rows[i] are the candidates in `b` of item i of `a`. The candidates in `a` of item j of `b` are column j,
+    # derived from the rows when read, so removing them clears one bit in each affected row.
+    def __init__(self, a: SuperSet, b: SuperSet):
+        self.a = a
+        self.b = b
+        self.sides = (a, b)
+        self.rows = [full(len(b.items))] * len(a.items)
+        # perfect matching of the rows, repaired by every all-different propagation
+        self.match = list(range(len(a.items)))
+        # called with (pair, orientation, index, removed) whenever a domain changes
+        self.listener = None
+
+    def get(self, o: int, i: int) -> int:
+        return column(self.rows, i) if o else self.rows[i]
+
+    def domains(self, o: int) -> list[int]:
+        # all masks of one side, the columns are computed at once
+        return transpose(self.rows, len(self.b.items)) if o else self.rows
+
+    def remove(self, o: int, i: int, mask: int) -> int:
+        rows = self.rows
+        if o:
+            # column i is only read, bit i is cleared in every affected row
+            mask &= column(rows, i)
+            b = 1 << i
+            for j in indices(mask):
+                rows[j] ^= b
+        else:
+            mask &= rows[i]
+            rows[i] ^= mask
+        if mask and self.listener:
+            self.listener(self, o, i, mask)
+        return mask
+
+    def restore(self, o: int, i: int, removed: int, previous: int):
+        if o:
+            b = 1 << i
+            for j in indices(removed):
+                self.rows[j] |= b
+        else:
+            self.rows[i] = previous
+
+    def load(self, rows):
+        # replaces all candidates by the given rows
+        self.rows[:] = rows
+
+    def copy(self, a: SuperSet, b: SuperSet, listener) -> 'Pair':
+        pair = Pair.__new__(Pair)
+        pair.a = a
+        pair.b = b
+        pair.sides = (a, b)
+        pair.rows = list(self.rows)
+        pair.match = list(self.match)
+        pair.listener = listener
+        return pair
+
 class ForeignSet:
-    def __init__(self, item, foreigns: list[Set]):
+    def __init__(self, item, super_set: SuperSet, index: int):
         self.item = item
-        self.foreigns = {f.name: f.items for f in foreigns}
+        self.super_set = super_set
+        self.index = index
+        self.bit = bit(index)
+
+    @property
+    def foreigns(self) -> dict[str, int]:
+        return {k: self.get(k) for k in self.super_set.foreign_keys}
+
+    def get(self, key: str) -> int:
+        pair, o = self.super_set.pairs[key]
+        return pair.get(o, self.index)
+
+    def remove(self, key: str, mask: int) -> int:
+        # removes the candidates in `mask`, the other side reads from the same pair
+        pair, o = self.super_set.pairs[key]
+        return pair.remove(o, self.index, mask)
+
+    def keep(self, key: str, mask: int) -> int:
+        return self.remove(key, ~mask)
+
+    def values(self, key: str) -> list:
+        items = self.super_set.super_sets[key].items
+        return [items[i] for i in indices(self.get(key))]
     
     def __repr__(self) -> str:
-        return f'{self.item}: {self.foreigns}'
\ No newline at end of file
+        return f'{self.item}: {{{", ".join(f"{k!r}: {self.values(k)}" for k in self.super_set.foreign_keys)}}}'
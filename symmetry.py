@@ -0,0 +1,106 @@
+from math import factorial
+from itertools import permutations, product
+from sets import OrderedSet, Item, Relation, ForeignSet
+
+# Item symmetries: two items of a set are interchangeable if swapping them maps the relations of the model onto themselves,
+# every solution then has a twin with the two items swapped. Interchangeable items form classes, within a class every
+# permutation is a symmetry. A class is broken by ordering its items by the index of their partners in a reference set,
+# which leaves one solution of every permutation group.
+
+def key(r: Relation) -> tuple:
+    # hashable form of `Relation.normalized` with items as (set name, index)
+    ty, a, b, f = r.normalized()
+    return ty, (a.set.name, a.index), (b.set.name, b.index), None if f is None else f.name
+
+def swap(k: tuple, x: tuple, y: tuple) -> tuple:
+    ty, a, b, f = k
+    a = y if a == x else x if a == y else a
+    b = y if b == x else x if b == y else b
+    if ty in ('eq', 'ne'):
+        a, b = sorted((a, b))
+    return ty, a, b, f
+
+def positional(model: 'Model') -> set[str]:
+    # sets whose item positions carry meaning, their items are never interchangeable
+    names = {s.name for s in model.sets if isinstance(s, OrderedSet)}
+    for r in model.relations:
+        if isinstance(r.a, ForeignSet):
+            names.add(r.a.set.name)
+        elif r.ty not in ('eq', 'ne'):
+            names.add(r.b.set.name)
+    return names
+
+def classes(model: 'Model') -> dict[str, list[list[int]]]:
+    # the classes of interchangeable items (indices, at least two) of every set
+    keys = {key(r) for r in model.relations}
+    uses = {}
+    for k in keys:
+        for x in (k[1], k[2]):
+            uses.setdefault(x, []).append(k)
+    fixed = positional(model)
+    result = {}
+    for s in model.sets:
+        if s.name in fixed:
+            continue
+        # cheap pre-grouping, interchangeable items are used in the same number of relations of each type
+        groups = {}
+        for i in range(len(s.items)):
+            signature = tuple(sorted((ty, f is None) for ty, _, _, f in uses.get((s.name, i), ())))
+            groups.setdefault(signature, []).append(i)
+        found = []
+        for group in groups.values():
+            # the transpositions with the first remaining item generate every permutation of a class
+            while len(group) > 1:
+                first = (s.name, group[0])
+                same = [group[0]] + [i for i in group[1:] if interchangeable(keys, uses, first, (s.name, i))]
+                if len(same) > 1:
+                    found.append(same)
+                group = [i for i in group if i not in same]
+        if found:
+            result[s.name] = found
+    return result
+
+def interchangeable(keys: set, uses: dict, x: tuple, y: tuple) -> bool:
+    # only the relations using x or y change when swapping them
+    return all(swap(k, x, y) in keys for k in uses.get(x, []) + uses.get(y, []))
+
+def symmetries(model: 'Model') -> tuple[list[list[Item]], list[Relation]]:
+    # the broken classes and the relations breaking them.
+    # The reference set has to stay fixed, so its own classes are only broken if another set without classes exists.
+    found = classes(model)
+    reference = next((s for s in model.sets if s.name not in found), model.sets[0])
+    broken = []
+    relations = []
+    for s in model.sets:
+        if s is reference or s.name not in found:
+            continue
+        for c in found[s.name]:
+            items = [s.interned[i] for i in c]
+            broken.append(items)
+            relations += [Relation(ForeignSet(a, reference), ForeignSet(b, reference), 'lt') for a, b in zip(items, items[1:])]
+    return broken, relations
+
+def multiplicity(broken: list[list[Item]]) -> int:
+    # number of solutions every solution of the broken model stands for
+    n = 1
+    for items in broken:
+        n *= factorial(len(items))
+    return n
+
+def expanded(solution, broken: list[list[Item]]):
+    # yields the solution with every permutation of the broken classes applied
+    columns = {name: i for i, name in enumerate(solution.headings)}
+    # the rows follow the items of the first set, they are reordered if those are renamed
+    first = next((items[0].set for items in broken if columns[items[0].set.name] == 0), None)
+    for choice in product(*(permutations(items) for items in broken)):
+        mapping = {}
+        for items, permuted in zip(broken, choice):
+            for a, b in zip(items, permuted):
+                mapping[columns[a.set.name], a.value] = b.value
+        rows = [tuple(mapping.get((c, v), v) for c, v in enumerate(row)) for row in solution.rows]
+        if first is not None:
+            rows.sort(key=lambda row: first.index[row[0]])
+        result = solution.__class__.__new__(solution.__class__)
+        result.headings = solution.headings
+        result.rows = rows
+        yield result
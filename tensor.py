@@ -0,0 +1,138 @@
+import numpy as np
+from time import perf_counter
+from solver import Solver, SolveTimeout
+from matching import supported
+
+# The whole model is stored as one boolean tensor t[A, a, B, b]:
+# item a of set A may correspond to item b of set B.
+# Blocks on the diagonal (A == B) are the identity, every item corresponds to itself.
+# The tensor is kept symmetric, t[A, a, B, b] == t[B, b, A, a].
+
+class TensorSolver(Solver):
+    def load(self) -> np.ndarray:
+        sizes = {len(ss.items) for ss in self.super_sets.values()}
+        if len(sizes) != 1:
+            raise Exception('The tensor engine requires all sets to be of equal size')
+        n = sizes.pop()
+        self.order = {name: i for i, name in enumerate(self.super_sets.keys())}
+        t = np.zeros((len(self.order), n, len(self.order), n), dtype=bool)
+        for ss in self.super_sets.values():
+            a = self.order[ss.name]
+            t[a, :, a, :] = np.eye(n, dtype=bool)
+            for i, f in enumerate(ss.foreign_sets.values()):
+                for key in ss.foreign_keys:
+                    t[a, i, self.order[key], :] = to_row(f.get(key), n)
+        return t
+
+    def store(self, t: np.ndarray):
+        for pair in self.pairs:
+            a, b = self.order[pair.a.name], self.order[pair.b.name]
+            self.replace(pair, [to_mask(t[a, i, b, :]) for i in range(len(pair.a.items))])
+
+    def run(self, max_iter, search, workers):
+        t = self.load()
+        iteration = 0
+        fixpoint = False
+        passes = (('relations', self.relations_pass), ('alldifferent', self.alldifferent_pass), ('transitive', transitive))
+        while (max_iter is None or iteration < max_iter) and not self.expired():
+            iteration += 1
+            previous = t.copy()
+            entry = self.stats.begin() if self.stats is not None else None
+            for name, run in passes:
+                t = run(t) if entry is None else self.timed(t, entry, name, run)
+            if np.array_equal(t, previous):
+                fixpoint = True
+                break
+        self.store(t)
+        if search or workers:
+            # branching continues on the python engine from the propagated state
+            return super().run(None, True, workers)
+        if not fixpoint and self.expired():
+            raise SolveTimeout(self)
+        return self.solution()
+
+    def relations_pass(self, t: np.ndarray) -> np.ndarray:
+        # remove recurring constraints
+        for r in self.relations:
+            self.evaluate_recurring(t, r)
+        return t
+
+    def alldifferent_pass(self, t: np.ndarray) -> np.ndarray:
+        # the same matching based all-different as the python engine (see `matching.py`) on every pair of sets
+        n = t.shape[1]
+        for pair in self.pairs:
+            a, b = self.order[pair.a.name], self.order[pair.b.name]
+            rows = [to_mask(row) for row in t[a, :, b]]
+            kept = supported(rows, pair.match)
+            if kept != rows:
+                block = np.array([to_row(m, n) for m in kept])
+                t[a, :, b] = block
+                t[b, :, a] = block.T
+        return t
+
+    def timed(self, t: np.ndarray, entry: dict, name: str, run) -> np.ndarray:
+        # the tensor holds every candidate twice, pruned counts them once like the python engine
+        before = int(t.sum())
+        start = perf_counter()
+        t = run(t)
+        self.stats.record(self, entry, name, perf_counter() - start, (before - int(t.sum())) // 2)
+        return t
+
+    def evaluate_recurring(self, t: np.ndarray, r):
+        s = self.order[r.a.set.name]
+        x, xi = self.order[r.a.item.set.name], r.a.item.index
+        y, yi = self.order[r.b.item.set.name], r.b.item.index
+        row_a, row_b = t[x, xi, s], t[y, yi, s]
+        # an empty side is already a contradiction, which is reported by the completeness check
+        if not row_a.any() or not row_b.any():
+            return
+        slots = np.arange(t.shape[3])
+        if r.ty == 'gt':
+            keep_a = slots > lowest(row_b)
+        elif r.ty == 'ge':
+            keep_a = slots >= lowest(row_b)
+        elif r.ty == 'lt':
+            keep_a = slots < highest(row_b)
+        elif r.ty == 'le':
+            keep_a = slots <= highest(row_b)
+        else:
+            raise Exception(f'Invalid or unreachable recurring relation type `{r.ty}`')
+        restrict(t, x, xi, s, keep_a)
+        row_a = t[x, xi, s]
+        if not row_a.any():
+            return
+        if r.ty == 'gt':
+            keep_b = slots < highest(row_a)
+        elif r.ty == 'ge':
+            keep_b = slots <= highest(row_a)
+        elif r.ty == 'lt':
+            keep_b = slots > lowest(row_a)
+        else:
+            keep_b = slots >= lowest(row_a)
+        restrict(t, y, yi, s, keep_b)
+
+def to_row(mask: int, n: int) -> np.ndarray:
+    raw = np.frombuffer(mask.to_bytes((n + 7) // 8, 'little'), dtype=np.uint8)
+    return np.unpackbits(raw, bitorder='little')[:n].astype(bool)
+
+def to_mask(row: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(row, bitorder='little').tobytes(), 'little')
+
+def lowest(row: np.ndarray) -> int:
+    return int(np.argmax(row))
+
+def highest(row: np.ndarray) -> int:
+    return len(row) - 1 - int(np.argmax(row[::-1]))
+
+def restrict(t: np.ndarray, a: int, i: int, b: int, keep: np.ndarray):
+    t[a, i, b] &= keep
+    t[b, :, a, i] &= keep
+
+def transitive(t: np.ndarray) -> np.ndarray:
+    # a and c may only correspond if for every set B some item b corresponds to both
+    sets, n = t.shape[0], t.shape[1]
+    flat = t.reshape(sets * n, sets * n).astype(np.float32)
+    for b in range(sets):
+        via = flat[:, b * n:(b + 1) * n] @ flat[b * n:(b + 1) * n, :]
+        t = t & (via > 0).reshape(t.shape)
+    return t
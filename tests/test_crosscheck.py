@@ -0,0 +1,187 @@
+import random
+import importlib.util
+from itertools import permutations, product
+import pytest
+from sets import Set, OrderedSet, Item, Relation, ForeignSet
+from solver import Model
+from matching import supported
+from sat import Sat
+import cache
+from generator import generate
+
+# Tiny models checked against brute force enumeration.
+
+ENGINES = ['python', 'sat'] + (['tensor'] if importlib.util.find_spec('numpy') else [])
+FLIPPED = {'eq': 'eq', 'ne': 'ne', 'lt': 'gt', 'le': 'ge', 'gt': 'lt', 'ge': 'le'}
+
+def build(seed: int, n: int = 3, count: int = None) -> tuple[list[Set], list]:
+    # between one and four relations, more hardly leave a solution
+    rnd = random.Random(seed)
+    count = 1 + seed % 4 if count is None else count
+    x, y = Set('x', [f'x{i}' for i in range(n)]), Set('y', [f'y{i}' for i in range(n)])
+    o = OrderedSet('o', list(range(1, n + 1)))
+    relations = []
+    for _ in range(count):
+        a, b = rnd.choice(x.items), rnd.choice(y.items)
+        kind = rnd.randrange(4)
+        if kind == 0:
+            r = x[a] == y[b]
+        elif kind == 1:
+            r = x[a] != y[b]
+        elif kind == 2:
+            r = x[a](o) < y[b](o)
+        else:
+            r = x[a] > o[rnd.choice(o.items)]
+        # some operators return several relations
+        relations += r if isinstance(r, list) else [r]
+    return [x, y, o], relations
+
+def model(sets: list[Set], relations: list) -> Model:
+    m = Model(*sets)
+    m.relate(list(relations))
+    return m
+
+def holds(r, row: dict, value: dict) -> bool:
+    # `row[item]` is the row of an item, `value[set name][row]` the item of that set in the row
+    if isinstance(r.a, Item):
+        if r.ty == 'eq':
+            return row[r.a] == row[r.b]
+        if r.ty == 'ne':
+            return row[r.a] != row[r.b]
+        a, b = value[r.b.set.name][row[r.a]], r.b.value
+    else:
+        a, b = value[r.a.set.name][row[r.a.item]], value[r.a.set.name][row[r.b.item]]
+    return {'lt': a < b, 'le': a <= b, 'gt': a > b, 'ge': a >= b}[r.ty]
+
+def brute(sets: list[Set], relations: list) -> list[list[tuple]]:
+    # every solution as rows ordered by the first set, like `Solution.rows`
+    n = len(sets[0].items)
+    result = []
+    for choice in product(permutations(range(n)), repeat=len(sets) - 1):
+        value = {sets[0].name: list(sets[0].items)}
+        for s, p in zip(sets[1:], choice):
+            value[s.name] = [s.items[i] for i in p]
+        row = {s[v]: r for s in sets for r, v in enumerate(value[s.name])}
+        if all(holds(r, row, value) for r in relations):
+            result.append([tuple(value[s.name][r] for s in sets) for r in range(n)])
+    return sorted(result)
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('seed', range(40))
+def test_engines(engine, seed):
+    sets, relations = build(seed)
+    expected = brute(sets, relations)
+    solver = model(sets, relations).solver(engine)
+    if not expected:
+        with pytest.raises(ArithmeticError):
+            solver.solve(search=True)
+        return
+    assert solver.solve(search=True).rows in expected
+    assert sorted(s.rows for s in solver.solutions()) == expected
+    assert solver.count() == len(expected)
+
+@pytest.mark.parametrize('seed', range(40))
+def test_symmetry(seed):
+    sets, relations = build(seed, count=2)
+    expected = brute(sets, relations)
+    solver = model(sets, relations).solver(symmetry=True)
+    assert solver.count() == len(expected)
+    assert sorted(s.rows for s in solver.solutions(expand=True)) == expected
+
+@pytest.mark.parametrize('seed', range(200))
+def test_matching(seed):
+    rnd = random.Random(seed)
+    n = rnd.randrange(1, 6)
+    rows = [rnd.getrandbits(n) for _ in range(n)]
+    match = [rnd.randrange(-1, n) for _ in range(n)]
+    kept = [0] * n
+    for p in permutations(range(n)):
+        if all(rows[i] >> j & 1 for i, j in enumerate(p)):
+            for i, j in enumerate(p):
+                kept[i] |= 1 << j
+    result = supported(rows, match)
+    if any(kept):
+        assert result == kept
+    else:
+        assert not all(result)
+
+@pytest.mark.parametrize('seed', range(200))
+def test_sat(seed):
+    rnd = random.Random(seed)
+    n = rnd.randrange(1, 9)
+    clauses = [[rnd.choice((1, -1)) * rnd.randrange(1, n + 1) for _ in range(rnd.randrange(1, 4))] for _ in range(rnd.randrange(1, 5 * n))]
+    sat = Sat()
+    for _ in range(n):
+        sat.var()
+    for c in clauses:
+        sat.add(c)
+    solution = sat.solve(restart_base=2)
+    satisfiable = any(all(any(bits[abs(l) - 1] == (l > 0) for l in c) for c in clauses) for bits in product((False, True), repeat=n))
+    assert (solution is not None) == satisfiable
+    if solution is not None:
+        assert all(any(solution[abs(l)] == (l > 0) for l in c) for c in clauses)
+
+def renamed(sets: list[Set], relations: list, seed: int) -> tuple[list[Set], list]:
+    # the same puzzle with other names and values, sets and relations shuffled and comparisons mirrored
+    rnd = random.Random(seed)
+    new = {s.name: (OrderedSet('_' + s.name, [v * 10 for v in s.items]) if isinstance(s, OrderedSet) else Set('_' + s.name, ['_' + v for v in s.items])) for s in sets}
+    def item(i: Item) -> Item:
+        return new[i.set.name].interned[i.index]
+    result = []
+    for r in relations:
+        if isinstance(r.a, Item):
+            a, b = item(r.a), item(r.b)
+            result.append(Relation(b, a, r.ty) if r.ty in ('eq', 'ne') else Relation(a, b, r.ty))
+        else:
+            f = new[r.a.set.name]
+            result.append(Relation(ForeignSet(item(r.b.item), f), ForeignSet(item(r.a.item), f), FLIPPED[r.ty]))
+    rnd.shuffle(result)
+    order = list(new.values())
+    rnd.shuffle(order)
+    return order, result
+
+@pytest.mark.parametrize('seed', range(40))
+def test_canonical_hash(seed):
+    sets, relations = build(seed)
+    other_sets, other_relations = renamed(sets, relations, seed)
+    assert cache.digest(model(sets, relations)) == cache.digest(model(other_sets, other_relations))
+    # a cached solution maps back onto the items of the renamed puzzle
+    c = cache.Cache()
+    m = model(sets, relations)
+    other = model(other_sets, other_relations)
+    expected = brute(other_sets, other_relations)
+    try:
+        c.solve(m, search=True)
+    except ArithmeticError:
+        assert not expected
+        return
+    assert sorted(c.solve(other, search=True).rows) in [sorted(rows) for rows in expected]
+    assert c.hits == 1
+
+def test_cache_engines():
+    # the sat engine solves an under-constrained model, the python engine without search does not
+    sets, _ = build(0)
+    m = model(sets[:2], [])
+    c = cache.Cache()
+    c.solve(m, engine='sat')
+    with pytest.raises(ValueError):
+        c.solve(m)
+    assert c.solve(m, search=True) and c.hits == 1
+
+@pytest.mark.parametrize('engine', [e for e in ENGINES if e != 'sat'])
+def test_hall_sets(engine):
+    # x0 and x1 share y0 and y1, so x2 and x3 are y2 and y3 and the rest is left to x4 and x5.
+    # No domain or column narrows to a single candidate, only a matching based all-different sees that.
+    x, y = Set('x', [f'x{i}' for i in range(6)]), Set('y', [f'y{i}' for i in range(6)])
+    relations = [x[f'x{i}'] != y[f'y{j}'] for i in range(4) for j in range(2 if i < 2 else 4, 6)]
+    solver = model([x, y], relations).solver(engine)
+    with pytest.raises(ValueError):
+        solver.solve()
+    assert [f.values('y') for f in solver.super_sets['x'].foreign_list] == [['y0', 'y1']] * 2 + [['y2', 'y3']] * 2 + [['y4', 'y5']] * 2
+
+@pytest.mark.skipif('tensor' not in ENGINES, reason='numpy is not installed')
+@pytest.mark.parametrize('seed', range(3))
+def test_tensor_propagates_like_python(seed):
+    # generated puzzles are solved by the python engine's propagation alone, the tensor engine must keep up
+    m, _ = generate(4, 8, seed=seed)
+    assert m.solver('tensor').solve() == m.solver().solve()
@@ -0,0 +1,24 @@
+import pytest
+import puzzle
+
+TEXT = '''
+set names: anne anja anke
+set last_names: kramer wolff lange
+ordered grades: 1.7 2.6 3.8
+names[anne](grades) == 2.6
+names[anja](grades) < last_names[wolff](grades)
+'''
+
+def test_mixed_ordered_items():
+    with pytest.raises(Exception, match='line 2: '):
+        puzzle.parse('set a: x y z\nordered b: 1 z 3\n')
+
+def test_save_keeps_mapped_records(tmp_path):
+    path = str(tmp_path / 'puzzle.lpsc')
+    puzzle.save(puzzle.parse(TEXT), path)
+    loaded = puzzle.load(path)
+    records = list(loaded.records)
+    puzzle.save(puzzle.parse(TEXT.replace('names[anne](grades)', 'names[anja] != grades[1.7]\nnames[anne](grades)')), path)
+    assert list(loaded.records) == records
+    assert len(puzzle.load(path).records) > len(records)
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['puzzle.lpsc']
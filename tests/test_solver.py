@@ -0,0 +1,121 @@
+import asyncio
+import threading
+import importlib.util
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from solver import SolveTimeout
+from test_crosscheck import build, model
+
+# Solver state around push/pop, search and repeated calls.
+
+ENGINES = ['python'] + (['tensor'] if importlib.util.find_spec('numpy') else [])
+
+@pytest.mark.parametrize('engine', ENGINES)
+@pytest.mark.parametrize('workers', [None, 2])
+def test_pop_after_solve(engine, workers):
+    sets, relations = build(1, count=2)
+    x, y, o = sets
+    solver = model(sets, relations).solver(engine)
+    solver.propagate()
+    before = solver.snapshot()
+    solver.push()
+    solver.add(x['x0'](o) < y['y0'](o))
+    solver.solve(search=True, workers=workers)
+    solver.pop()
+    assert solver.snapshot() == before
+
+@pytest.mark.parametrize('engine', ENGINES + ['sat'])
+def test_count_after_search(engine):
+    # two sets without relations have 3! solutions, a search must not keep its guesses
+    sets, _ = build(0)
+    solver = model(sets[:2], []).solver(engine)
+    assert not solver.is_unique() and solver.count() == 6
+    solution = solver.solve(search=True)
+    assert not solver.is_unique() and solver.count() == 6
+    assert solution in list(solver.solutions())
+
+def test_max_iter_counts_sweeps_per_call():
+    sets, relations = build(7, n=4, count=4)
+    full = model(sets, relations).solver()
+    full.propagate()
+    solver = model(sets, relations).solver()
+    for _ in range(8):
+        assert solver.propagate(max_iter=1) <= 1
+    # every call gets its own budget, eight single sweeps propagate the model completely
+    assert solver.snapshot() == full.snapshot() and not solver.queue
+    assert solver.propagate(max_iter=0) == 0
+
+@pytest.mark.parametrize('engine', ENGINES)
+def test_instrument(engine):
+    sets, relations = build(7, n=4, count=4)
+    solver = model(sets, relations).solver(engine)
+    stats = solver.instrument()
+    solver.solve(search=True)
+    # every engine records its own passes
+    own = {'python': 'alldifferent', 'tensor': 'transitive'}[engine]
+    assert stats.total[own]['runs'] > 0
+    assert sum(e['pruned'] for e in stats.total.values()) > 0
+
+def outcome(call):
+    try:
+        return call().rows
+    except ValueError:
+        return ValueError
+
+@pytest.mark.parametrize('engine', ENGINES + ['sat'])
+@pytest.mark.parametrize('search', [False, True])
+def test_solve_async_matches_solve(engine, search):
+    # an under-constrained model, only the sat engine and a search solve it
+    sets, _ = build(0)
+    expected = outcome(lambda: model(sets[:2], []).solver(engine).solve(search=search))
+    solver = model(sets[:2], []).solver(engine)
+    assert outcome(lambda: asyncio.run(solver.solve_async(search=search))) == expected
+
+@pytest.mark.parametrize('engine', ['python', 'sat'])
+@pytest.mark.parametrize('asynchronous', [False, True])
+def test_timeout(engine, asynchronous):
+    sets, relations = build(7, n=4, count=4)
+    solver = model(sets, relations).solver(engine)
+    with pytest.raises(SolveTimeout) as error:
+        if asynchronous:
+            asyncio.run(solver.solve_async(search=True, timeout=0))
+        else:
+            solver.solve(search=True, timeout=0)
+    assert error.value.solver is solver
+    assert solver.deadline is None
+
+def test_cancel_restores_stop():
+    sets, _ = build(0, n=5)
+    solver = model(sets[:2], []).solver()
+    started, resume = threading.Event(), threading.Event()
+    def previous():
+        # holds the search at its first node until the task is cancelled
+        started.set()
+        resume.wait()
+        return False
+    solver.stop = previous
+    executor = ThreadPoolExecutor(1)
+    async def main():
+        task = asyncio.create_task(solver.solve_async(search=True, executor=executor))
+        while not started.is_set():
+            await asyncio.sleep(0.001)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(main())
+    resume.set()
+    executor.shutdown(wait=True)
+    assert solver.stop is previous
+    assert solver.count() == 120
+
+@pytest.mark.parametrize('chunk', [None, 3])
+def test_stats_per_sweep(chunk):
+    # one iteration per sweep, also when sweeps are split across calls
+    sets, relations = build(7, n=4, count=4)
+    solver = model(sets, relations).solver()
+    stats = solver.instrument()
+    sweeps = 0
+    while solver.queue and solver.conflict is None:
+        sweeps += solver.propagate(max_propagations=chunk)
+    assert sweeps == 3 and len(stats.iterations) == 3
+    assert sum(e['runs'] for e in stats.total.values()) == solver.propagations